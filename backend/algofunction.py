@@ -1,26 +1,31 @@
-from algorithm.execution import execute_algorithm
-from algorithm.exe_academic import execute_academic_algorithm
-from algorithm.exe_mental import execute_mental_algorithm
-from algorithm.exe_social import execute_social_algorithm
+# The algorithm modules (torch, torch_geometric, ortools, sklearn, plotting) are imported
+# inside run_algorithm so that importing this module stays cheap for the API process.
 from dataloading.api import DB
 from dataloading.dataloader import DataLoader
 from services.db import get_db
 from services.loader import get_loader
 
 
-def run_algorithm(option = "balanced", save_data = True):
+def preload_algorithm_stack():
+    """
+    Import the algorithm modules up front (warm worker), so jobs do not pay for it.
+    """
+    import algorithm.pipeline
+
+
+def run_algorithm(option = "balanced", save_data = True, warm_start = True):
+    from algorithm.pipeline import MODE_PROFILES, AllocationPipeline
+
     dl = get_loader()
 
     df_output_dict = dl.get_data_from_survey()
 
-    if option == "academic":
-        df_SNA, Y_pred_df, predicted_link_df = execute_academic_algorithm(df_output_dict, False, False)
-    elif option == "mental":
-        df_SNA, Y_pred_df, predicted_link_df = execute_mental_algorithm(df_output_dict, False, False)
-    elif option == "social":
-        df_SNA, Y_pred_df, predicted_link_df = execute_social_algorithm(df_output_dict, False, False)
-    else:
-        df_SNA, Y_pred_df, predicted_link_df = execute_algorithm(df_output_dict, False, False)
+    # Seed the solver with the last saved allocation, falls back to Current_Class
+    hint_allocation = dl.get_last_allocation() if warm_start else None
+
+    mode = option if option in MODE_PROFILES else "balanced"
+    pipeline = AllocationPipeline(df_output_dict, mode)
+    df_SNA, Y_pred_df, predicted_link_df = pipeline.solve(mode, False, False, hint_allocation)
     df_SNA["Participant_ID"] = df_SNA.index
     Y_pred_df["Participant_ID"] = Y_pred_df.index
 
@@ -32,6 +37,7 @@ def run_algorithm(option = "balanced", save_data = True):
 
     if save_data:
         last_run_id = dl.create_agent_data(push_data_dict)
+        dl.update_process_run_stats(last_run_id, {**pipeline.link_training_stats, **pipeline.allocation_stats})
         dl.update_last_process_run(process_run_id=last_run_id)
         return last_run_id
     
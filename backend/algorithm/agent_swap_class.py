@@ -6,7 +6,6 @@ from algorithm.feature_engineer import (build_updated_net_dict,
                               compute_predicted_wellbeing_scores)
 
 from algorithm.utils import set_seed
-set_seed(42)
 
 # === Load Required Files ===
 survey_outcome = pd.read_csv("df.csv", index_col="Participant_ID")
@@ -32,6 +31,7 @@ last_result = {}
 
 def reallocate_student_to_class(student_id: int, new_class: int):
     global last_result
+    set_seed(42)
 
     # === Step 2: Reassign student to new class
     alloc_df.loc[student_id, "Assigned_Class"] = new_class
@@ -0,0 +1,191 @@
+import os
+import io
+import pickle
+import random
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+# ==============================
+# Content-addressed stage cache for the training stages of the pipeline
+# (RF predictor, RGCN embeddings, link model). A stage result is keyed by a hash of
+# the stage name, its inputs, its hyperparameters and the RNG state it starts from;
+# the RNG state it leaves behind is stored with it and restored on a hit, so a run
+# that hits the cache continues exactly like a cold run.
+# Only useful in a long-lived process such as the warm worker; disabled (max_bytes=0) by default.
+# ==============================
+
+_stage_cache = OrderedDict()   # key -> (stage, value, rng_state_after, nbytes), least recently used first
+_stage_lock = threading.Lock()
+_max_bytes = 0
+_cached_bytes = 0
+_stats = {}                    # stage -> {"hits", "misses", "evictions"}
+
+
+def configure_artifact_cache(max_mb: float = 0):
+    """
+    Keep at most max_mb of stage results resident (0 disables caching).
+    """
+    global _max_bytes
+    with _stage_lock:
+        _max_bytes = max(0, int(max_mb * 1024 * 1024))
+        _evict_locked()
+
+
+def clear_artifact_cache():
+    global _cached_bytes
+    with _stage_lock:
+        _stage_cache.clear()
+        _cached_bytes = 0
+
+
+def artifact_cache_stats() -> dict:
+    """
+    Hit/miss/eviction counters per stage plus current cache size.
+    """
+    with _stage_lock:
+        return {
+            "stages": {stage: dict(counts) for stage, counts in _stats.items()},
+            "entries": len(_stage_cache),
+            "bytes": _cached_bytes,
+            "max_bytes": _max_bytes,
+        }
+
+
+def _count(stage, field):
+    _stats.setdefault(stage, {"hits": 0, "misses": 0, "evictions": 0})[field] += 1
+
+
+def _evict_locked():
+    global _cached_bytes
+    while _stage_cache and _cached_bytes > _max_bytes:
+        _, (stage, _, _, nbytes) = _stage_cache.popitem(last=False)
+        _cached_bytes -= nbytes
+        _count(stage, "evictions")
+
+
+def _update_hash(h, obj):
+    if isinstance(obj, pd.DataFrame):
+        h.update(repr(list(obj.columns)).encode())
+        h.update(pd.util.hash_pandas_object(obj, index=True).values.tobytes())
+    elif isinstance(obj, pd.Series):
+        h.update(repr(obj.name).encode())
+        h.update(pd.util.hash_pandas_object(obj, index=True).values.tobytes())
+    elif isinstance(obj, np.ndarray):
+        h.update(repr((obj.dtype.str, obj.shape)).encode())
+        h.update(np.ascontiguousarray(obj).tobytes())
+    elif hasattr(obj, "detach") and hasattr(obj, "cpu"):   # torch.Tensor
+        _update_hash(h, obj.detach().cpu().numpy())
+    elif isinstance(obj, dict):
+        for k in sorted(obj, key=repr):
+            h.update(repr(k).encode())
+            _update_hash(h, obj[k])
+    elif isinstance(obj, (list, tuple)):
+        h.update(f"[{len(obj)}".encode())
+        for item in obj:
+            _update_hash(h, item)
+    else:
+        h.update(repr(obj).encode())
+
+
+def artifact_fingerprint(*objs) -> str:
+    """
+    Stable hash of stage inputs (DataFrames/arrays/tensors by content, dicts order-independent).
+    """
+    h = hashlib.sha256()
+    for obj in objs:
+        _update_hash(h, obj)
+    return h.hexdigest()
+
+
+def _capture_rng_state():
+    import torch
+    return random.getstate(), np.random.get_state(), torch.get_rng_state()
+
+
+def _restore_rng_state(state):
+    import torch
+    py_state, np_state, torch_state = state
+    random.setstate(py_state)
+    np.random.set_state(np_state)
+    torch.set_rng_state(torch_state)
+
+
+def artifact_nbytes(value) -> int:
+    """
+    Approximate in-memory size: tensor/array storage, module parameters, sklearn tree node
+    arrays, else pickled size.
+    """
+    if isinstance(value, (tuple, list)):
+        return sum(artifact_nbytes(v) for v in value)
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if hasattr(value, "element_size") and hasattr(value, "nelement"):   # torch.Tensor
+        return value.element_size() * value.nelement()
+    if hasattr(value, "parameters") and hasattr(value, "buffers"):      # torch.nn.Module
+        return sum(t.element_size() * t.nelement() for t in list(value.parameters()) + list(value.buffers()))
+    if hasattr(value, "tree_"):                                          # sklearn tree
+        state = value.tree_.__getstate__()
+        return state["nodes"].nbytes + state["values"].nbytes
+    if hasattr(value, "estimators_"):                                    # sklearn forest / MultiOutputRegressor
+        return sum(artifact_nbytes(e) for e in np.ravel(np.asarray(value.estimators_, dtype=object)))
+    buf = io.BytesIO()
+    try:
+        pickle.dump(value, buf, protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception:
+        return 0
+    return buf.tell()
+
+
+def cached_stage(stage: str, inputs, params: dict, build, uses_global_rng: bool = True):
+    """
+    Return build() for this stage, reusing the stored result when the stage name, inputs,
+    hyperparameters and (if uses_global_rng) starting RNG state all match a previous call.
+    Stages seeded by their own random_state should pass uses_global_rng=False so they neither
+    read nor restore the process RNG while other stages run concurrently.
+    """
+    with _stage_lock:
+        enabled = _max_bytes > 0
+    if not enabled:
+        return build()
+
+    rng_before = _capture_rng_state() if uses_global_rng else None
+    key = artifact_fingerprint(stage, inputs, params, rng_before)
+
+    with _stage_lock:
+        entry = _stage_cache.get(key)
+        if entry is not None:
+            _stage_cache.move_to_end(key)
+            _count(stage, "hits")
+    if entry is not None:
+        _, value, rng_after, _ = entry
+        if rng_after is not None:
+            _restore_rng_state(rng_after)
+        print(f"Stage cache hit: {stage}")
+        return value
+
+    value = build()
+    rng_after = _capture_rng_state() if uses_global_rng else None
+    nbytes = artifact_nbytes(value)
+
+    global _cached_bytes
+    with _stage_lock:
+        _count(stage, "misses")
+        if nbytes <= _max_bytes and key not in _stage_cache:
+            _stage_cache[key] = (stage, value, rng_after, nbytes)
+            _cached_bytes += nbytes
+            _evict_locked()
+    return value
+
+
+def process_rss_bytes() -> int:
+    """
+    Resident set size of this process (Linux /proc, 0 if unavailable).
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
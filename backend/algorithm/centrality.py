@@ -0,0 +1,431 @@
+import os
+import math
+import atexit
+import hashlib
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from scipy.sparse.csgraph import connected_components
+
+# ==============================
+# Centrality engine on CSR adjacency (unweighted, directed)
+# Level-synchronous BFS from a batch of sources at a time: each BFS level is one sparse x dense
+# product, so shortest-path counts (sigma), distances and Brandes dependencies for B sources are
+# computed together in NumPy/SciPy instead of per node in Python, one weakly connected component at a time.
+#   exact  - all sources; closeness / betweenness match nx.closeness_centrality (wf_improved=True)
+#            and nx.betweenness_centrality (normalized=True) up to float rounding
+#   approx - k sampled pivot sources, estimates scaled by n / k (k from epsilon/delta if not given)
+# ==============================
+
+BATCH_CELLS = 2_000_000   # sources x nodes per BFS batch (float64 -> ~16 MB per matrix)
+BLOCK_NODES = 256         # small components are solved together up to this many nodes
+MEMO_SIZE = int(os.getenv("SNA_CENTRALITY_MEMO_SIZE", "64"))   # graphs kept in the memo (0 disables it)
+PARALLEL_MIN_EDGES = int(os.getenv("SNA_PARALLEL_MIN_EDGES", "20000"))   # below this, the pool costs more than it saves
+
+
+def csr_from_edges(sources, targets, nodes = None):
+    """
+    Directed 0/1 adjacency (duplicate edges collapsed, like nx.DiGraph) and the node list.
+    Nodes default to first-appearance order in the edge list (the node order NetworkX uses).
+    """
+    sources = np.asarray(sources)
+    targets = np.asarray(targets)
+    if nodes is None:
+        nodes = pd.unique(np.column_stack([sources, targets]).ravel()) if len(sources) else np.empty(0)
+    nodes = list(nodes)
+    n = len(nodes)
+
+    index = pd.Index(nodes)
+    src = index.get_indexer(sources)
+    dst = index.get_indexer(targets)
+    if len(src) and (src.min() < 0 or dst.min() < 0):
+        raise ValueError("Edge endpoint not in node list")
+
+    A = sp.csr_matrix((np.ones(len(src), dtype=np.float64), (src, dst)), shape=(n, n))
+    A.sum_duplicates()
+    A.data[:] = 1.0
+    return A, nodes
+
+
+def pivot_sample_size(n, epsilon = 0.05, delta = 0.1):
+    """
+    Pivots k so that every normalized betweenness estimate is within epsilon of the exact value
+    with probability >= 1 - delta (Hoeffding bound + union bound over n nodes):
+    k >= ln(2n / delta) / (2 epsilon^2). Capped at n (exact).
+    """
+    if n <= 1:
+        return n
+    # b(v) = n/(n-1) * E[delta_s(v) / (n-2)], so the per-pivot error is scaled by (n-1)/n
+    eps = epsilon * (n - 1) / n
+    return min(n, int(math.ceil(math.log(2 * n / delta) / (2 * eps ** 2))))
+
+
+def _bfs_batch(A, AT, batch_sources, n):
+    """
+    BFS + Brandes dependency accumulation for a batch of sources.
+    Returns (dist (B, n) with -1 for unreachable, delta (B, n)).
+    """
+    B = len(batch_sources)
+    rows = np.arange(B)
+    dist = np.full((B, n), -1, dtype=np.int32)
+    sigma = np.zeros((B, n), dtype=np.float64)
+    dist[rows, batch_sources] = 0
+    sigma[rows, batch_sources] = 1.0
+
+    levels = [np.zeros((B, n), dtype=bool)]
+    levels[0][rows, batch_sources] = True
+    frontier = sigma.copy()
+    depth = 0
+    while True:
+        # paths reaching w at depth+1 = sum of sigma over frontier predecessors v -> w
+        reached = np.asarray(AT.dot(frontier.T)).T
+        new = (reached > 0) & (dist < 0)
+        if not new.any():
+            break
+        depth += 1
+        dist[new] = depth
+        sigma[new] = reached[new]
+        levels.append(new)
+        frontier = np.where(new, sigma, 0.0)
+
+    delta = np.zeros((B, n), dtype=np.float64)
+    for d in range(depth, 0, -1):
+        coeff = np.where(levels[d], (1.0 + delta) / np.where(sigma > 0, sigma, 1.0), 0.0)
+        # sum over successors w of v on the next level
+        upstream = np.asarray(A.dot(coeff.T)).T
+        delta += np.where(levels[d - 1], sigma * upstream, 0.0)
+    delta[rows, batch_sources] = 0.0
+    return dist, delta
+
+
+def centrality_stats(A, sources = None, batch_size = None):
+    """
+    Raw per-node statistics from BFS out of `sources` (default: all nodes):
+    reach[v]  - number of sources that reach v (v itself included if it is a source)
+    totsp[v]  - sum of distances from those sources to v
+    betweenness[v] - unnormalized Brandes betweenness (directed) over the sources
+    Paths never leave a weakly connected component, so components are solved on their own
+    submatrices (class graphs are disjoint, and the dense BFS state is O(sources x nodes)).
+    """
+    A = sp.csr_matrix(A)
+    n = A.shape[0]
+    is_source = np.ones(n, dtype=bool) if sources is None else np.isin(np.arange(n), sources)
+
+    reach = np.zeros(n, dtype=np.int64)
+    totsp = np.zeros(n, dtype=np.float64)
+    betweenness = np.zeros(n, dtype=np.float64)
+    if n == 0:
+        return {"reach": reach, "totsp": totsp, "betweenness": betweenness}
+
+    n_components, labels = connected_components(A, directed=True, connection="weak")
+    sizes = np.bincount(labels, minlength=n_components)
+
+    # isolated nodes (self-loop at most) only reach themselves
+    singletons = sizes[labels] == 1
+    reach[singletons] = is_source[singletons]
+
+    # Pack small components into blocks of up to BLOCK_NODES nodes; components stay whole
+    blocks, block, block_nodes = [], [], 0
+    for c in np.flatnonzero(sizes > 1):
+        if block and block_nodes + sizes[c] > BLOCK_NODES:
+            blocks.append(block)
+            block, block_nodes = [], 0
+        block.append(c)
+        block_nodes += sizes[c]
+    if block:
+        blocks.append(block)
+
+    for block in blocks:
+        nodes = np.flatnonzero(np.isin(labels, block))
+        local_sources = np.flatnonzero(is_source[nodes])
+        if not len(local_sources):
+            continue
+
+        sub = A[nodes][:, nodes]
+        sub_T = sub.T.tocsr()
+        size = batch_size or max(1, BATCH_CELLS // len(nodes))
+        for start in range(0, len(local_sources), size):
+            dist, delta = _bfs_batch(sub, sub_T, local_sources[start:start + size], len(nodes))
+            reachable = dist >= 0
+            reach[nodes] += reachable.sum(axis=0)
+            totsp[nodes] += np.where(reachable, dist, 0).sum(axis=0)
+            betweenness[nodes] += delta.sum(axis=0)
+    return {"reach": reach, "totsp": totsp, "betweenness": betweenness}
+
+
+def closeness_from_stats(reach, totsp, n):
+    """
+    nx.closeness_centrality (wf_improved=True) from incoming reach / distance sums.
+    """
+    reach = np.asarray(reach, dtype=np.float64)
+    totsp = np.asarray(totsp, dtype=np.float64)
+    closeness = np.zeros(len(reach), dtype=np.float64)
+    if n > 1:
+        ok = totsp > 0
+        closeness[ok] = (reach[ok] - 1.0) / totsp[ok] * ((reach[ok] - 1.0) / (n - 1))
+    return closeness
+
+
+def betweenness_scale(n):
+    # nx.betweenness_centrality(normalized=True) on a directed graph
+    return 1.0 / ((n - 1) * (n - 2)) if n > 2 else 1.0
+
+
+def compute_centralities(A, mode = "exact", k = None, epsilon = 0.05, delta = 0.1, seed = 42):
+    """
+    In/out degree, closeness and betweenness arrays for the CSR adjacency A.
+    mode="approx" uses k pivots (default pivot_sample_size(n, epsilon, delta)); the closeness of
+    each node is then estimated from the sampled sources that reach it (Eppstein-Wang style).
+    """
+    A = sp.csr_matrix(A)
+    n = A.shape[0]
+    in_degree = np.diff(A.tocsc().indptr)
+    out_degree = np.diff(A.indptr)
+
+    if mode == "exact" or n <= 2:
+        sources, factor = None, 1.0
+    elif mode == "approx":
+        k = min(n, k or pivot_sample_size(n, epsilon, delta))
+        sources = np.sort(np.random.default_rng(seed).choice(n, size=k, replace=False))
+        factor = n / k
+    else:
+        raise ValueError(f"Unknown centrality mode '{mode}'")
+
+    stats = centrality_stats(A, sources)
+    if factor == 1.0:
+        reach, totsp = stats["reach"], stats["totsp"]
+    else:
+        # every node reaches itself; scale only the sampled other sources
+        own = np.zeros(n, dtype=np.float64)
+        own[sources] = 1.0
+        reach = 1.0 + (stats["reach"] - own) * factor
+        totsp = stats["totsp"] * factor
+    return {
+        "in_degree": in_degree,
+        "out_degree": out_degree,
+        "closeness": closeness_from_stats(reach, totsp, n),
+        "betweenness": stats["betweenness"] * factor * betweenness_scale(n),
+    }
+
+
+def edge_centralities(sources, targets, mode = "exact", **kwargs):
+    """
+    Centralities of the directed graph given by an edge list, as {metric: {node: value}}.
+    """
+    A, nodes = csr_from_edges(sources, targets)
+    values = compute_centralities(A, mode=mode, **kwargs)
+    return {metric: dict(zip(nodes, array.tolist())) for metric, array in values.items()}
+
+
+# ==============================
+# Centrality memo
+# The same relation graph is analysed by several feature views (compute_sna_features_from_graphs
+# for the predictor, enrich_student_data for the wellbeing baseline), by concurrent prepare stages
+# and again by later modes/jobs in a warm worker. Results are keyed by a fingerprint of the node
+# ids + CSR arrays + engine settings; concurrent requests for the same graph compute it once.
+# ==============================
+
+_memo = OrderedDict()       # fingerprint -> {metric: array}, least recently used first
+_memo_lock = threading.Lock()
+_inflight = {}              # fingerprint -> threading.Event of the computing thread
+_memo_stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+
+def graph_fingerprint(A, node_ids, *settings) -> str:
+    A = sp.csr_matrix(A)
+    h = hashlib.sha256()
+    node_ids = np.asarray(node_ids)
+    h.update(repr((node_ids.dtype.str, A.shape, settings)).encode())
+    h.update(node_ids.tobytes() if node_ids.dtype != object else repr(node_ids.tolist()).encode())
+    h.update(np.ascontiguousarray(A.indptr, dtype=np.int64).tobytes())
+    h.update(np.ascontiguousarray(A.indices, dtype=np.int64).tobytes())
+    return h.hexdigest()
+
+
+def _publish(key, values):
+    for array in values.values():
+        array.setflags(write=False)
+    with _memo_lock:
+        _memo[key] = values
+        _memo_stats["misses"] += 1
+        while len(_memo) > MEMO_SIZE:
+            _memo.popitem(last=False)
+            _memo_stats["evictions"] += 1
+
+
+def memoized_centralities_many(graphs, mode = "exact", workers = 0, **kwargs):
+    """
+    compute_centralities for a list of (A, node_ids), in the same order. Graphs already in the
+    memo are reused; the rest are computed together (in the process pool if workers > 1), and
+    graphs another thread is computing are awaited. Returned arrays are shared with the memo
+    and must not be modified.
+    """
+    graphs = [(sp.csr_matrix(A), node_ids) for A, node_ids in graphs]
+    if MEMO_SIZE <= 0:
+        return compute_centralities_many([A for A, _ in graphs], mode, workers, **kwargs)
+
+    keys = [graph_fingerprint(A, node_ids, mode, sorted(kwargs.items())) for A, node_ids in graphs]
+    results = [None] * len(graphs)
+    owned, waiting = [], []
+    with _memo_lock:
+        for i, key in enumerate(keys):
+            if key in _memo:
+                _memo.move_to_end(key)
+                _memo_stats["hits"] += 1
+                results[i] = _memo[key]
+            elif key in _inflight:
+                waiting.append(i)   # computed by another thread, or earlier in this list
+            else:
+                _inflight[key] = threading.Event()
+                owned.append(i)
+
+    try:
+        computed = compute_centralities_many([graphs[i][0] for i in owned], mode, workers, **kwargs)
+        for i, values in zip(owned, computed):
+            _publish(keys[i], values)
+            results[i] = values
+    finally:
+        with _memo_lock:
+            events = [_inflight.pop(keys[i]) for i in owned]
+        for event in events:
+            event.set()
+
+    for i in waiting:
+        results[i] = memoized_centralities(*graphs[i], mode=mode, **kwargs)
+    return results
+
+
+def memoized_centralities(A, node_ids, mode = "exact", **kwargs):
+    """
+    compute_centralities(A, mode, **kwargs), reused for a graph with the same node ids and edges.
+    The returned arrays are shared with the memo and must not be modified.
+    """
+    if MEMO_SIZE <= 0:
+        return compute_centralities(A, mode=mode, **kwargs)
+
+    key = graph_fingerprint(A, node_ids, mode, sorted(kwargs.items()))
+    while True:
+        with _memo_lock:
+            if key in _memo:
+                _memo.move_to_end(key)
+                _memo_stats["hits"] += 1
+                return _memo[key]
+            event = _inflight.get(key)
+            owner = event is None
+            if owner:
+                event = _inflight[key] = threading.Event()
+        if owner:
+            break
+        event.wait()   # another thread is computing this graph; re-check the memo
+
+    try:
+        values = compute_centralities(A, mode=mode, **kwargs)
+        _publish(key, values)
+        return values
+    finally:
+        with _memo_lock:
+            del _inflight[key]
+        event.set()
+
+
+def clear_centrality_memo():
+    with _memo_lock:
+        _memo.clear()
+
+
+def centrality_memo_stats() -> dict:
+    with _memo_lock:
+        return {**_memo_stats, "entries": len(_memo), "max_entries": MEMO_SIZE}
+
+
+# ==============================
+# Process pool for independent relation graphs
+# The CSR arrays of all graphs are packed into one shared-memory block; each task gets the block
+# name and its offsets, attaches without copying and returns only the per-node result arrays.
+# Results are collected in submission order, so features assemble deterministically.
+# "spawn" children do not inherit torch/OpenMP state from the (threaded) parent.
+# ==============================
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def _get_pool(workers):
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown()
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _pool_workers = workers
+        return _pool
+
+
+def shutdown_centrality_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
+
+
+atexit.register(shutdown_centrality_pool)
+
+
+def _shared_task(shm_name, total, n, indptr_span, indices_span, mode, kwargs):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        return _centralities_from_buffer(shm.buf, total, n, indptr_span, indices_span, mode, kwargs)
+    finally:
+        try:
+            shm.close()
+        except BufferError:
+            pass   # a failed task's traceback can still hold a view; the parent unlinks the block
+
+
+def _centralities_from_buffer(buf, total, n, indptr_span, indices_span, mode, kwargs):
+    packed = np.ndarray((total,), dtype=np.int32, buffer=buf)
+    indptr = packed[indptr_span[0]:indptr_span[1]]
+    indices = packed[indices_span[0]:indices_span[1]]
+    A = sp.csr_matrix((np.ones(len(indices)), indices, indptr), shape=(n, n), copy=False)
+    return compute_centralities(A, mode=mode, **kwargs)
+
+
+def compute_centralities_many(graphs, mode = "exact", workers = 0, **kwargs):
+    """
+    compute_centralities for each CSR matrix in graphs, results in the same order.
+    With workers > 1 and at least PARALLEL_MIN_EDGES edges in total, the graphs are solved in
+    a process pool reading their arrays from shared memory.
+    """
+    graphs = [sp.csr_matrix(A) for A in graphs]
+    if workers <= 1 or len(graphs) <= 1 or sum(A.nnz for A in graphs) < PARALLEL_MIN_EDGES:
+        return [compute_centralities(A, mode=mode, **kwargs) for A in graphs]
+
+    spans, offset = [], 0
+    for A in graphs:
+        indptr_span = (offset, offset + len(A.indptr))
+        indices_span = (indptr_span[1], indptr_span[1] + len(A.indices))
+        spans.append((indptr_span, indices_span))
+        offset = indices_span[1]
+
+    shm = shared_memory.SharedMemory(create=True, size=max(1, offset * 4))
+    try:
+        packed = np.ndarray((offset,), dtype=np.int32, buffer=shm.buf)
+        for A, (indptr_span, indices_span) in zip(graphs, spans):
+            packed[indptr_span[0]:indptr_span[1]] = A.indptr
+            packed[indices_span[0]:indices_span[1]] = A.indices
+        del packed
+
+        pool = _get_pool(workers)
+        futures = [pool.submit(_shared_task, shm.name, offset, A.shape[0], indptr_span, indices_span, mode, kwargs)
+                   for A, (indptr_span, indices_span) in zip(graphs, spans)]
+        return [future.result() for future in futures]
+    finally:
+        shm.close()
+        shm.unlink()
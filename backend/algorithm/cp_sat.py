@@ -1,10 +1,12 @@
 #----------------------------Re-apply threshold, CP-SAT (with enrich link)----------------------------#
+import os
+import time
+import tracemalloc
 import pandas as pd
 import numpy as np
 import torch
 from ortools.sat.python import cp_model
-from algorithm.utils import set_seed
-set_seed(42)
+from algorithm.multilink_prediction import predict_links_batched
 
 # ==============================
 # Step 1: Build enriched links
@@ -40,316 +42,373 @@ def build_enriched_links(predicted_links_dict):
 # ==============================
 # Step 2: Re-threshold links
 # ==============================
-def apply_thresholds_from_classes(embeddings, model, relation_list, alloc_df, same_class_threshold=0.5, diff_class_threshold=0.7):
-    model.eval()
-    predicted_links = {rel: [] for rel in relation_list}
-
-    with torch.no_grad():
-        n = embeddings.size(0)
-        for u in range(n):
-            for v in range(n):
-                if u == v:
-                    continue
-                feature = torch.cat([embeddings[u], embeddings[v]]).unsqueeze(0)
-                logits = model(feature)
-                probs = torch.sigmoid(logits).squeeze(0)
-
-                same_class = alloc_df.iloc[u]['Assigned_Class'] == alloc_df.iloc[v]['Assigned_Class']
-                threshold = same_class_threshold if same_class else diff_class_threshold
-
-                valid = True
-                if probs[relation_list.index("friends")].item() >= threshold and probs[relation_list.index("disrespect")].item() >= threshold:
-                    valid = False
-                if probs[relation_list.index("disrespect")].item() >= threshold and probs[relation_list.index("influential")].item() < threshold:
-                    valid = False
-
-                if valid:
-                    for idx, prob in enumerate(probs):
-                        if prob.item() >= threshold:
-                            predicted_links[relation_list[idx]].append((u, v))
-    return predicted_links
+def apply_thresholds_from_classes(embeddings, model, relation_list, alloc_df, same_class_threshold=0.5, diff_class_threshold=0.7, chunk_size=32768):
+    # Classes are looked up by position (row u of the embeddings <-> row u of alloc_df)
+    n = embeddings.size(0)
+    class_labels = alloc_df['Assigned_Class'].to_numpy()[:n]
+
+    return predict_links_batched(
+        embeddings, model, relation_list, class_labels,
+        same_class_threshold=same_class_threshold,
+        diff_class_threshold=diff_class_threshold,
+        chunk_size=chunk_size
+    )
 
 # ==============================
 # Step 3: CP-SAT allocation
 # ==============================
-def cpsat_wellbeing_and_ties_allocation(df, n_classes, enriched_links, wellbeing_weight=1, tolerance=0.1):
-    model = cp_model.CpModel()
-    n_students = len(df)
-    students = range(n_students)
-    classes = range(n_classes)
-
-    assign = {}
-    for s in students:
-        for c in classes:
-            assign[(s, c)] = model.NewBoolVar(f'student_{s}_class_{c}')
-
-    for s in students:
-        model.AddExactlyOne(assign[(s, c)] for c in classes)
-
-    base_size = n_students // n_classes
-    min_size = int(base_size * (1 - tolerance))
-    max_size = int(base_size * (1 + tolerance))
-    for c in classes:
-        model.Add(sum(assign[(s, c)] for s in students) >= min_size)
-        model.Add(sum(assign[(s, c)] for s in students) <= max_size)
-
-    objective_terms = []
-
-    for s in students:
-        wellbeing_score = (
-            df.iloc[s]['academic_score'] +
-            df.iloc[s]['mental_score'] +
-            df.iloc[s]['social_score']
-        )
-        for c in classes:
-            objective_terms.append(assign[(s, c)] * int(wellbeing_score * wellbeing_weight * 100))
-
+def aggregate_pair_weights(enriched_links):
+    """
+    Collapse parallel/opposite links into one net weight per unordered pair {u, v}.
+    Pairs whose weights cancel out are dropped. Self-pairs are always in the same
+    class, so they only add a constant to the objective and are skipped as well.
+    """
+    pair_weights = {}
     for u, v, relation, weight in enriched_links:
-        for c in classes:
-            same_class = model.NewBoolVar(f'same_class_{relation}_{u}_{v}_{c}')
-            model.AddMultiplicationEquality(same_class, [assign[(u, c)], assign[(v, c)]])
-            objective_terms.append(weight * same_class)
-
-    model.Maximize(sum(objective_terms))
-
-    solver = cp_model.CpSolver()
-    solver.parameters.random_seed = 42
-    solver.parameters.linearization_level = 0
-    solver.parameters.max_time_in_seconds = 20 # --need tune
-    solver.parameters.num_search_workers = 8
-    solver.parameters.num_search_workers = 1
-    status = solver.Solve(model)
-
-    allocation = []
-
-    if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
-        for s in students:
+        if u == v:
+            continue
+        pair = (u, v) if u < v else (v, u)
+        pair_weights[pair] = pair_weights.get(pair, 0) + weight
+    return {pair: weight for pair, weight in pair_weights.items() if weight != 0}
+
+def add_tie_objective_terms(model, assign, classes, enriched_links, tie_encoding="product"):
+    """
+    Objective terms rewarding (or penalising) linked students placed in the same class.
+    Returns (variables, weights) for LinearExpr.WeightedSum.
+
+    tie_encoding="product": one BoolVar per (link, class) tied with AddMultiplicationEquality.
+    tie_encoding="pair": one BoolVar per unordered pair with a non-zero net weight, linearised
+    with implications. Positive weights only need an upper bound (same => equal class indicators),
+    negative weights only need a lower bound (both in class c => same).
+    """
+    tie_vars, tie_weights = [], []
+
+    if tie_encoding == "product":
+        for u, v, relation, weight in enriched_links:
             for c in classes:
-                if solver.BooleanValue(assign[(s, c)]):
-                    allocation.append((s, c))
-    else:
-        return None
-
-    return allocation
-
+                same_class = model.NewBoolVar(f'same_class_{relation}_{u}_{v}_{c}')
+                model.AddMultiplicationEquality(same_class, [assign[(u, c)], assign[(v, c)]])
+                tie_vars.append(same_class)
+                tie_weights.append(weight)
+
+    elif tie_encoding == "pair":
+        for (u, v), weight in aggregate_pair_weights(enriched_links).items():
+            same_class = model.NewBoolVar(f'same_class_{u}_{v}')
+            for c in classes:
+                if weight > 0:
+                    model.AddBoolOr([same_class.Not(), assign[(u, c)].Not(), assign[(v, c)]])
+                else:
+                    model.AddBoolOr([assign[(u, c)].Not(), assign[(v, c)].Not(), same_class])
+            tie_vars.append(same_class)
+            tie_weights.append(weight)
 
-# maximise social score
-def cpsat_social_allocation(df, n_classes, enriched_links, wellbeing_weight=1, dominance_factor=1000, penalty_factor=100, tolerance=0.1, social_boost_factor=2.0):
-    model = cp_model.CpModel()
-    n_students = len(df)
-    students = range(n_students)
-    classes = range(n_classes)
+    else:
+        raise ValueError(f"Unknown tie_encoding '{tie_encoding}', expected 'product' or 'pair'")
 
-    assign = {}
-    for s in students:
-        for c in classes:
-            assign[(s, c)] = model.NewBoolVar(f'student_{s}_class_{c}')
+    return tie_vars, tie_weights
 
-    for s in students:
-        model.AddExactlyOne(assign[(s, c)] for c in classes)
+def evaluate_allocation_ties(allocation, enriched_links):
+    """
+    Tie part of the objective for a [(student_idx, class)] allocation.
+    """
+    student_class = dict(allocation)
+    return sum(weight for u, v, _, weight in enriched_links if student_class.get(u) == student_class.get(v))
 
+# ==============================
+# Unified allocation model
+# ==============================
+# Objective specs for the four allocation modes. "wellbeing" rewards the summed wellbeing score,
+# "dominant" strongly rewards one score (boosted below 70) and lightly penalises the other two
+# (penalty shrunk above 80). Solver settings are the ones each mode has always used.
+ALLOCATION_OBJECTIVES = {
+    "balanced": {
+        "kind": "wellbeing",
+        "solver": {"max_time_in_seconds": 20, "num_search_workers": 1, "random_seed": 42, "linearization_level": 0},
+    },
+    "social": {
+        "kind": "dominant",
+        "dominant_score": "social_score",
+        "solver": {"max_time_in_seconds": 40, "num_search_workers": 8},
+    },
+    "academic": {
+        "kind": "dominant",
+        "dominant_score": "academic_score",
+        "solver": {"max_time_in_seconds": 40, "num_search_workers": 8},
+    },
+    "mental": {
+        "kind": "dominant",
+        "dominant_score": "mental_score",
+        "solver": {"max_time_in_seconds": 40, "num_search_workers": 8},
+    },
+}
+
+SCORE_COLUMNS = ['academic_score', 'mental_score', 'social_score']
+
+def compute_student_coefficients(df, objective="balanced", wellbeing_weight=1, dominance_factor=1000,
+                                 penalty_factor=100, boost_factor=2.0):
+    """
+    Per-student integer objective coefficients as one NumPy vector.
+    Matches the int() truncation of the original per-student loops.
+    """
+    spec = ALLOCATION_OBJECTIVES[objective]
+    scores = {col: df[col].to_numpy(dtype=float) for col in SCORE_COLUMNS}
+    if any(np.isnan(values).any() for values in scores.values()):
+        raise ValueError("cannot convert float NaN to integer: missing wellbeing scores")
+
+    if spec["kind"] == "wellbeing":
+        wellbeing_score = scores['academic_score'] + scores['mental_score'] + scores['social_score']
+        return np.trunc(wellbeing_score * wellbeing_weight * 100).astype(np.int64)
+
+    dominant = spec["dominant_score"]
+    dominant_weight = wellbeing_weight * dominance_factor * 1000  # Base dominance
+    dominant_weight = np.where(scores[dominant] < 70, dominant_weight * boost_factor, dominant_weight)
+    coefficients = np.trunc(scores[dominant] * dominant_weight).astype(np.int64)
+
+    # Lower weight if scores are high, to reduce their influence
+    minor_weight = 0.005 * penalty_factor
+    for col in SCORE_COLUMNS:
+        if col == dominant:
+            continue
+        weight = np.where(scores[col] > 80, minor_weight * 0.01, minor_weight)
+        coefficients -= np.trunc(scores[col] * weight).astype(np.int64)
+
+    return coefficients
+
+def class_size_bounds(n_students, n_classes, tolerance=0.1):
     base_size = n_students // n_classes
-    min_size = int(base_size * (1 - tolerance))
-    max_size = int(base_size * (1 + tolerance))
-    for c in classes:
-        model.Add(sum(assign[(s, c)] for s in students) >= min_size)
-        model.Add(sum(assign[(s, c)] for s in students) <= max_size)
-        
-    objective_terms = []
-
-    for s in students:
-        for c in classes:
-            # Student scores
-            social_score = df.iloc[s]['social_score']
-            academic_score = df.iloc[s]['academic_score']
-            mental_score = df.iloc[s]['mental_score']
-
-            # --- Step 1: SOCIAL weight - dominant ---
-            social_weight = wellbeing_weight * dominance_factor * 1000  # Base dominance
-            if social_score < 70:
-                social_weight *= social_boost_factor  # Amplify further if needed
-
-            # --- Step 2: Academic & Mental - minor penalties ---
-            # Lower weight if scores are high, to reduce their influence
-            academic_weight = 0.005 * penalty_factor
-            mental_weight = 0.005 * penalty_factor
-            if academic_score > 80:
-                academic_weight *= 0.01
-            if mental_score > 80:
-                mental_weight *= 0.01
-
-            # --- Step 3: Objective Terms ---
-            objective_terms.append(assign[(s, c)] * int(social_score * social_weight))
-            objective_terms.append(-assign[(s, c)] * int(academic_score * academic_weight))
-            objective_terms.append(-assign[(s, c)] * int(mental_score * mental_weight))
-
-    for u, v, relation, weight in enriched_links:
-        for c in classes:
-            same_class = model.NewBoolVar(f'same_class_{relation}_{u}_{v}_{c}')
-            model.AddMultiplicationEquality(same_class, [assign[(u, c)], assign[(v, c)]])
-            objective_terms.append(weight * same_class)
-
-    model.Maximize(sum(objective_terms))
-
-    solver = cp_model.CpSolver()
-    solver.parameters.max_time_in_seconds = 40
-    solver.parameters.num_search_workers = 8
-    status = solver.Solve(model)
-
-    allocation = []
-
-    if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
-        for s in students:
-            for c in classes:
-                if solver.BooleanValue(assign[(s, c)]):
-                    allocation.append((s, c))
-    else:
-        return None
-
-    return allocation
+    return int(base_size * (1 - tolerance)), int(base_size * (1 + tolerance))
+
+def canonical_class_labels(labels, n_classes):
+    """
+    Relabel an allocation so classes are numbered by their lowest-indexed member
+    (the order enforced by add_class_symmetry_breaking). Missing labels and classes
+    beyond n_classes map to None.
+    """
+    mapping = {}
+    canonical = []
+    for label in labels:
+        if label is None or pd.isna(label):
+            canonical.append(None)
+            continue
+        if label not in mapping:
+            mapping[label] = len(mapping)
+        canonical.append(mapping[label] if mapping[label] < n_classes else None)
+    return canonical
+
+def allocation_hint(student_ids, current_class, saved_allocation=None):
+    """
+    Class label per student (in student_ids order) used to warm-start CP-SAT:
+    the last saved allocation when given, the survey's Current_Class otherwise.
+    """
+    source = saved_allocation if saved_allocation is not None else current_class
+    return list(pd.Series(source).reindex(student_ids))
+
+def hint_within_bounds(hint, n_students, n_classes, tolerance=0.1):
+    """
+    True when the hint labels every student and its class sizes meet class_size_bounds.
+    """
+    labels = canonical_class_labels(list(hint)[:n_students], n_classes)
+    if len(labels) < n_students or any(label is None for label in labels):
+        return False
+    min_size, max_size = class_size_bounds(n_students, n_classes, tolerance)
+    sizes = np.bincount(labels, minlength=n_classes)
+    return len(sizes) == n_classes and sizes.min() >= min_size and sizes.max() <= max_size
+
+def add_class_symmetry_breaking(model, assign, min_size):
+    """
+    Classes are interchangeable, so order them by their lowest-indexed member:
+    student s can only open classes 0..s and first(c) < first(c + 1).
+    """
+    n_students, n_classes = assign.shape
+
+    for s in range(min(n_students, n_classes)):
+        for c in range(s + 1, n_classes):
+            model.Add(assign[s, c] == 0)
+
+    # first[c] = lowest student index in class c (n_students when the class is empty)
+    first = []
+    for c in range(n_classes):
+        first_c = model.NewIntVar(0, n_students, f'first_member_class_{c}')
+        model.AddMinEquality(first_c, [n_students - (n_students - s) * assign[s, c] for s in range(n_students)])
+        first.append(first_c)
+
+    for c in range(n_classes - 1):
+        if min_size > 0:
+            model.Add(first[c] < first[c + 1])
+        else:
+            model.Add(first[c] <= first[c + 1])
+
+def add_allocation_hint(model, assign, hint):
+    """
+    Seed the solver with AddHint from one class label per student. Labels can be any
+    hashable class name; they are renumbered to the canonical class order first, which
+    keeps the hint consistent with add_class_symmetry_breaking.
+    """
+    n_students, n_classes = assign.shape
+    labels = canonical_class_labels(list(hint)[:n_students], n_classes)
+
+    for s, label in enumerate(labels):
+        if label is None:
+            continue
+        for c in range(n_classes):
+            model.AddHint(assign[s, c], c == label)
+
+def build_allocation_model(df, n_classes, enriched_links, objective="balanced", tolerance=0.1,
+                           tie_encoding="product", symmetry_breaking=False, hint=None, **objective_params):
+    """
+    Assignment + class-size model shared by every allocation mode.
+    Returns (model, assign) where assign[s, c] is the BoolVar "student s in class c".
+    """
+    coefficients = compute_student_coefficients(df, objective, **objective_params)
 
-# maximise academic score
-def cpsat_academic_allocation(df, n_classes, enriched_links, wellbeing_weight=1, dominance_factor=1000, penalty_factor=100, tolerance=0.1, social_boost_factor=2.0):
     model = cp_model.CpModel()
     n_students = len(df)
-    students = range(n_students)
     classes = range(n_classes)
 
-    assign = {}
-    for s in students:
+    assign = np.empty((n_students, n_classes), dtype=object)
+    for s in range(n_students):
         for c in classes:
-            assign[(s, c)] = model.NewBoolVar(f'student_{s}_class_{c}')
-
-    for s in students:
-        model.AddExactlyOne(assign[(s, c)] for c in classes)
+            assign[s, c] = model.NewBoolVar(f'student_{s}_class_{c}')
+        model.AddExactlyOne(assign[s].tolist())
 
-    base_size = n_students // n_classes
-    min_size = int(base_size * (1 - tolerance))
-    max_size = int(base_size * (1 + tolerance))
+    min_size, max_size = class_size_bounds(n_students, n_classes, tolerance)
     for c in classes:
-        model.Add(sum(assign[(s, c)] for s in students) >= min_size)
-        model.Add(sum(assign[(s, c)] for s in students) <= max_size)
-        
-    objective_terms = []
+        model.AddLinearConstraint(cp_model.LinearExpr.Sum(assign[:, c].tolist()), min_size, max_size)
 
-    for s in students:
-        for c in classes:
-            # Student scores
-            social_score = df.iloc[s]['social_score']
-            academic_score = df.iloc[s]['academic_score']
-            mental_score = df.iloc[s]['mental_score']
-
-            academic_weight = wellbeing_weight * dominance_factor * 1000  # Base dominance
-            if academic_score < 70:
-                academic_weight *= social_boost_factor  # Amplify further if needed
-
-            # Lower weight if scores are high, to reduce their influence
-            social_weight = 0.005 * penalty_factor
-            mental_weight = 0.005 * penalty_factor
-            if social_score > 80:
-                social_weight *= 0.01
-            if mental_score > 80:
-                mental_weight *= 0.01
-
-            # --- Step 3: Objective Terms ---
-            objective_terms.append(-assign[(s, c)] * int(social_score * social_weight))
-            objective_terms.append(assign[(s, c)] * int(academic_score * academic_weight))
-            objective_terms.append(-assign[(s, c)] * int(mental_score * mental_weight))
+    if symmetry_breaking:
+        add_class_symmetry_breaking(model, assign, min_size)
 
-    for u, v, relation, weight in enriched_links:
-        for c in classes:
-            same_class = model.NewBoolVar(f'same_class_{relation}_{u}_{v}_{c}')
-            model.AddMultiplicationEquality(same_class, [assign[(u, c)], assign[(v, c)]])
-            objective_terms.append(weight * same_class)
+    if hint is not None:
+        add_allocation_hint(model, assign, hint)
+
+    tie_vars, tie_weights = add_tie_objective_terms(model, assign, classes, enriched_links, tie_encoding)
 
-    model.Maximize(sum(objective_terms))
+    # Every student sits in exactly one class and their coefficient does not depend on the class,
+    # so sum_c coef[s] * assign[s, c] == coef[s]: the per-student terms fold into a constant.
+    model.Maximize(cp_model.LinearExpr.WeightedSum(tie_vars, tie_weights) + int(coefficients.sum()))
 
+    return model, assign
+
+def solve_allocation_model(model, assign, max_time_in_seconds=20, num_search_workers=8,
+                           random_seed=None, linearization_level=None):
     solver = cp_model.CpSolver()
-    solver.parameters.max_time_in_seconds = 40
-    solver.parameters.num_search_workers = 8
+    if random_seed is not None:
+        solver.parameters.random_seed = random_seed
+    if linearization_level is not None:
+        solver.parameters.linearization_level = linearization_level
+    solver.parameters.max_time_in_seconds = max_time_in_seconds
+    solver.parameters.num_search_workers = num_search_workers
     status = solver.Solve(model)
 
-    allocation = []
-
-    if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
-        for s in students:
-            for c in classes:
-                if solver.BooleanValue(assign[(s, c)]):
-                    allocation.append((s, c))
-    else:
+    if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
         return None
 
-    return allocation
-
-# max mental score
-def cpsat_mental_allocation(df, n_classes, enriched_links, wellbeing_weight=1, dominance_factor=1000, penalty_factor=100, tolerance=0.1, social_boost_factor=2.0):
-    model = cp_model.CpModel()
-    n_students = len(df)
-    students = range(n_students)
-    classes = range(n_classes)
-
-    assign = {}
-    for s in students:
-        for c in classes:
-            assign[(s, c)] = model.NewBoolVar(f'student_{s}_class_{c}')
+    n_students, n_classes = assign.shape
+    allocation = []
+    for s in range(n_students):
+        for c in range(n_classes):
+            if solver.BooleanValue(assign[s, c]):
+                allocation.append((s, c))
+                break
 
-    for s in students:
-        model.AddExactlyOne(assign[(s, c)] for c in classes)
+    return allocation
 
-    base_size = n_students // n_classes
-    min_size = int(base_size * (1 - tolerance))
-    max_size = int(base_size * (1 + tolerance))
-    for c in classes:
-        model.Add(sum(assign[(s, c)] for s in students) >= min_size)
-        model.Add(sum(assign[(s, c)] for s in students) <= max_size)
-        
-    objective_terms = []
+def cpsat_allocation(df, n_classes, enriched_links, objective="balanced", tolerance=0.1,
+                     tie_encoding="product", max_time_in_seconds=None, symmetry_breaking=False,
+                     hint=None, **objective_params):
+    solver_params = dict(ALLOCATION_OBJECTIVES[objective]["solver"])
+    if max_time_in_seconds is not None:
+        solver_params["max_time_in_seconds"] = max_time_in_seconds
+
+    model, assign = build_allocation_model(
+        df, n_classes, enriched_links, objective=objective, tolerance=tolerance,
+        tie_encoding=tie_encoding, symmetry_breaking=symmetry_breaking, hint=hint,
+        **objective_params
+    )
+    return solve_allocation_model(model, assign, **solver_params)
+
+def cpsat_wellbeing_and_ties_allocation(df, n_classes, enriched_links, wellbeing_weight=1, tolerance=0.1, tie_encoding="product", max_time_in_seconds=20, symmetry_breaking=False, hint=None):
+    return cpsat_allocation(
+        df, n_classes, enriched_links, objective="balanced", tolerance=tolerance,
+        tie_encoding=tie_encoding, max_time_in_seconds=max_time_in_seconds,
+        symmetry_breaking=symmetry_breaking, hint=hint, wellbeing_weight=wellbeing_weight
+    )
+
+def _current_rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
 
-    for s in students:
-        for c in classes:
-            # Student scores
-            social_score = df.iloc[s]['social_score']
-            academic_score = df.iloc[s]['academic_score']
-            mental_score = df.iloc[s]['mental_score']
-
-            mental_weight = wellbeing_weight * dominance_factor * 1000  # Base dominance
-            if mental_score < 70:
-                mental_weight *= social_boost_factor  # Amplify further if needed
-
-            # Lower weight if scores are high, to reduce their influence
-            social_weight = 0.005 * penalty_factor
-            academic_weight = 0.005 * penalty_factor
-            if social_score > 80:
-                social_weight *= 0.01
-            if academic_score > 80:
-                academic_weight *= 0.01
-
-            # --- Step 3: Objective Terms ---
-            objective_terms.append(-assign[(s, c)] * int(social_score * social_weight))
-            objective_terms.append(-assign[(s, c)] * int(academic_score * academic_weight))
-            objective_terms.append(assign[(s, c)] * int(mental_score * mental_weight))
+def benchmark_tie_encodings(df, n_classes, enriched_links, encodings=("product", "pair"), objective="balanced", max_time_in_seconds=20, **kwargs):
+    """
+    Build and solve the allocation model once per tie encoding.
+    Reports model size, build time, peak Python memory during the build, resident memory
+    held by the built model, solve time and the tie objective of the returned allocation
+    (same scale for every encoding).
+    """
+    rows = []
+    for encoding in encodings:
+        rss_before = _current_rss_bytes()
+        tracemalloc.start()
+        start = time.perf_counter()
+        model, _ = build_allocation_model(df, n_classes, enriched_links, objective=objective, tie_encoding=encoding, **kwargs)
+        build_seconds = time.perf_counter() - start
+        _, peak_bytes = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        model_rss_bytes = _current_rss_bytes() - rss_before if rss_before is not None else None
+        proto = model.Proto()
+        num_variables = len(proto.variables)
+        num_constraints = len(proto.constraints)
+        del model, proto
+
+        start = time.perf_counter()
+        allocation = cpsat_allocation(
+            df, n_classes, enriched_links, objective=objective, tie_encoding=encoding,
+            max_time_in_seconds=max_time_in_seconds, **kwargs
+        )
+        solve_seconds = time.perf_counter() - start
 
-    for u, v, relation, weight in enriched_links:
-        for c in classes:
-            same_class = model.NewBoolVar(f'same_class_{relation}_{u}_{v}_{c}')
-            model.AddMultiplicationEquality(same_class, [assign[(u, c)], assign[(v, c)]])
-            objective_terms.append(weight * same_class)
+        rows.append({
+            "tie_encoding": encoding,
+            "num_variables": num_variables,
+            "num_constraints": num_constraints,
+            "model_rss_bytes": model_rss_bytes,
+            "build_peak_python_bytes": peak_bytes,
+            "build_seconds": build_seconds,
+            "solve_seconds": solve_seconds,
+            "feasible": allocation is not None,
+            "tie_objective": evaluate_allocation_ties(allocation, enriched_links) if allocation else None,
+        })
 
-    model.Maximize(sum(objective_terms))
+    return pd.DataFrame(rows)
 
-    solver = cp_model.CpSolver()
-    solver.parameters.max_time_in_seconds = 40
-    solver.parameters.num_search_workers = 8
-    status = solver.Solve(model)
 
-    allocation = []
+# maximise social score
+def cpsat_social_allocation(df, n_classes, enriched_links, wellbeing_weight=1, dominance_factor=1000, penalty_factor=100, tolerance=0.1, social_boost_factor=2.0, symmetry_breaking=False, hint=None, tie_encoding="product"):
+    return cpsat_allocation(
+        df, n_classes, enriched_links, objective="social", tolerance=tolerance,
+        tie_encoding=tie_encoding, symmetry_breaking=symmetry_breaking, hint=hint,
+        wellbeing_weight=wellbeing_weight, dominance_factor=dominance_factor,
+        penalty_factor=penalty_factor, boost_factor=social_boost_factor
+    )
 
-    if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
-        for s in students:
-            for c in classes:
-                if solver.BooleanValue(assign[(s, c)]):
-                    allocation.append((s, c))
-    else:
-        return None
+# maximise academic score
+def cpsat_academic_allocation(df, n_classes, enriched_links, wellbeing_weight=1, dominance_factor=1000, penalty_factor=100, tolerance=0.1, social_boost_factor=2.0, symmetry_breaking=False, hint=None, tie_encoding="product"):
+    return cpsat_allocation(
+        df, n_classes, enriched_links, objective="academic", tolerance=tolerance,
+        tie_encoding=tie_encoding, symmetry_breaking=symmetry_breaking, hint=hint,
+        wellbeing_weight=wellbeing_weight, dominance_factor=dominance_factor,
+        penalty_factor=penalty_factor, boost_factor=social_boost_factor
+    )
 
-    return allocation
+# max mental score
+def cpsat_mental_allocation(df, n_classes, enriched_links, wellbeing_weight=1, dominance_factor=1000, penalty_factor=100, tolerance=0.1, social_boost_factor=2.0, symmetry_breaking=False, hint=None, tie_encoding="product"):
+    return cpsat_allocation(
+        df, n_classes, enriched_links, objective="mental", tolerance=tolerance,
+        tie_encoding=tie_encoding, symmetry_breaking=symmetry_breaking, hint=hint,
+        wellbeing_weight=wellbeing_weight, dominance_factor=dominance_factor,
+        penalty_factor=penalty_factor, boost_factor=social_boost_factor
+    )
@@ -1,11 +1,12 @@
+import os
 import pandas as pd
 import random
+import threading
 import numpy as np
 import torch
-import networkx as nx
 from sklearn.preprocessing import MinMaxScaler, LabelEncoder
-from algorithm.utils import set_seed
-set_seed(42)
+from algorithm.centrality import csr_from_edges, centrality_stats, memoized_centralities_many
+from algorithm.graph import RelationGraph
 
 
 TARGET_MAX_SCORE = 100
@@ -19,22 +20,52 @@ relationship_weights = {
     "feedback":1.5
 }
 
+# Centralities: "exact" matches NetworkX, "approx" samples pivot sources (error bound epsilon, see algorithm.centrality)
+CENTRALITY_MODE = os.getenv("SNA_CENTRALITY_MODE", "exact")
+CENTRALITY_EPSILON = float(os.getenv("SNA_CENTRALITY_EPSILON", "0.05"))
+# Relation graphs solved in parallel worker processes (0/1 = in this process)
+SNA_FEATURE_WORKERS = int(os.getenv("SNA_FEATURE_WORKERS", "0"))
+
+
+def _relation_csr(net_dict, relation):
+    if isinstance(net_dict, RelationGraph):
+        return net_dict.csr(relation), net_dict.node_ids(relation)
+    edges = net_dict[relation]
+    if isinstance(edges, pd.DataFrame):
+        sources, targets = edges['Source'].to_numpy(), edges['Target'].to_numpy()
+    else:
+        sources, targets = [u for u, _ in edges], [v for _, v in edges]
+    return csr_from_edges(sources, targets)
+
+
+def relation_centralities(net_dict):
+    """
+    {relation: {metric: {node: value}}} (in/out degree, closeness, betweenness) for every directed
+    relation of a RelationGraph, or of a dict of Source/Target DataFrames or (u, v) lists, in
+    relation order. Memoized per graph, so every feature view of the same relation graph shares
+    one computation; the remaining graphs go to the process pool when SNA_FEATURE_WORKERS > 1.
+    """
+    relations = list(net_dict)
+    graphs = [_relation_csr(net_dict, relation) for relation in relations]
+    values = memoized_centralities_many(graphs, mode=CENTRALITY_MODE, workers=SNA_FEATURE_WORKERS,
+                                        epsilon=CENTRALITY_EPSILON)
+
+    centralities = {}
+    for relation, (_, node_ids), metrics in zip(relations, graphs, values):
+        node_ids = np.asarray(node_ids).tolist()
+        centralities[relation] = {metric: dict(zip(node_ids, array.tolist())) for metric, array in metrics.items()}
+    return centralities
+
 # === Feature Engineering ===
 def enrich_student_data(survey_df, net_dict, net_affiliation):
     df = survey_df.copy()
 
     # 1. Add SNA metrics from social networks
-    for relation, edge_df in net_dict.items():
-        if isinstance(edge_df, list):
-            G = nx.DiGraph()
-            G.add_edges_from(edge_df)
-        else:
-            G = nx.from_pandas_edgelist(edge_df, source='Source', target='Target', create_using=nx.DiGraph())
-
-        sna_temp = pd.DataFrame(index=G.nodes())
-        sna_temp[f'{relation}_in_deg'] = pd.Series(dict(G.in_degree()))
-        sna_temp[f'{relation}_close'] = pd.Series(nx.closeness_centrality(G))
-        sna_temp[f'{relation}_between'] = pd.Series(nx.betweenness_centrality(G))
+    for relation, centralities in relation_centralities(net_dict).items():
+        sna_temp = pd.DataFrame(index=list(centralities['in_degree']))
+        sna_temp[f'{relation}_in_deg'] = pd.Series(centralities['in_degree'])
+        sna_temp[f'{relation}_close'] = pd.Series(centralities['closeness'])
+        sna_temp[f'{relation}_between'] = pd.Series(centralities['betweenness'])
 
         df = df.merge(sna_temp, left_index=True, right_index=True, how='left')
 
@@ -126,21 +157,118 @@ def build_updated_net_dict(alloc_df, predicted_links_dict):
     return updated_net_dict_df
 
 # === SNA feature extractor ===
+def _sna_feature_frame(relation, in_degree, out_degree, closeness, betweenness):
+    return pd.DataFrame({
+        f'{relation}_in_degree': pd.Series(in_degree),
+        f'{relation}_out_degree': pd.Series(out_degree),
+        f'{relation}_closeness': pd.Series(closeness),
+        f'{relation}_betweenness': pd.Series(betweenness),
+    })
+
+def _assemble_sna_features(feature_list):
+    return pd.concat(feature_list, axis=1).groupby(level=0).first().fillna(0)
+
 def compute_sna_features_from_graphs(net_dict, relationship_weights):
     feature_list = []
-    for relation, edge_df in net_dict.items():
-        G = nx.from_pandas_edgelist(edge_df, source='Source', target='Target', create_using=nx.DiGraph())
-        weight = relationship_weights.get(relation, 1)
-        for u, v in G.edges():
-            G[u][v]['weight'] = weight
-        df_temp = pd.DataFrame({
-            f'{relation}_in_degree': pd.Series(dict(G.in_degree())),
-            f'{relation}_out_degree': pd.Series(dict(G.out_degree())),
-            f'{relation}_closeness': pd.Series(nx.closeness_centrality(G)),
-            f'{relation}_betweenness': pd.Series(nx.betweenness_centrality(G)),
-        })
+    # Centralities are unweighted (as nx.closeness_centrality / nx.betweenness_centrality without weight)
+    for relation, centralities in relation_centralities(net_dict).items():
+        df_temp = _sna_feature_frame(
+            relation,
+            centralities['in_degree'],
+            centralities['out_degree'],
+            centralities['closeness'],
+            centralities['betweenness'],
+        )
         feature_list.append(df_temp)
-    return pd.concat(feature_list, axis=1).groupby(level=0).first().fillna(0)
+    return _assemble_sna_features(feature_list)
+
+# === Incremental SNA features (reallocation) ===
+class IncrementalSNAFeatures:
+    """
+    Same output as compute_sna_features_from_graphs(build_updated_net_dict(alloc_df, links), weights),
+    but keeps one graph per (relation, class) with its raw centralities.
+
+    build_updated_net_dict only keeps intra-class links, so the class subgraphs are disconnected
+    from each other and their shortest paths never cross. Only the classes whose edge set changed
+    since the last update (normally the old and the new class of a moved student) are recomputed;
+    the global node count is applied afterwards, exactly as NetworkX normalises.
+    """
+    def __init__(self, relationship_weights):
+        self.relationship_weights = relationship_weights
+        self.partitions = {}
+        self.last_recomputed = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _partition_edges(alloc_df, links):
+        # Same class lookup as build_updated_net_dict
+        student_to_class = dict(zip(alloc_df.index, alloc_df['Assigned_Class']))
+        partitions = {}
+        for u, v in links:
+            cls = student_to_class.get(u)
+            if cls == student_to_class.get(v):
+                partitions.setdefault(cls, []).append((u, v))
+        return partitions
+
+    @staticmethod
+    def _raw_stats(edges):
+        # Exact, unnormalized: the global normalisation is applied in _relation_frame
+        A, nodes = csr_from_edges([u for u, _ in edges], [v for _, v in edges])
+        stats = centrality_stats(A)
+
+        return {
+            "nodes": nodes,
+            "in_degree": dict(zip(nodes, np.diff(A.tocsc().indptr).tolist())),
+            "out_degree": dict(zip(nodes, np.diff(A.indptr).tolist())),
+            "reach": dict(zip(nodes, stats["reach"].tolist())),
+            "totsp": dict(zip(nodes, stats["totsp"].tolist())),
+            "betweenness": dict(zip(nodes, stats["betweenness"].tolist())),
+        }
+
+    def _relation_frame(self, relation, partitions):
+        in_degree, out_degree, closeness, betweenness = {}, {}, {}, {}
+        len_G = sum(len(stats["nodes"]) for _, stats in partitions.values())
+        scale = 1 / ((len_G - 1) * (len_G - 2)) if len_G > 2 else None
+
+        for _, stats in partitions.values():
+            in_degree.update(stats["in_degree"])
+            out_degree.update(stats["out_degree"])
+            for node in stats["nodes"]:
+                # Matches nx.closeness_centrality(wf_improved=True) on the full relation graph
+                totsp = stats["totsp"][node]
+                _closeness = 0.0
+                if totsp > 0.0 and len_G > 1:
+                    _closeness = (stats["reach"][node] - 1.0) / totsp
+                    _closeness *= (stats["reach"][node] - 1.0) / (len_G - 1)
+                closeness[node] = _closeness
+
+                _betweenness = stats["betweenness"][node]
+                if scale is not None:
+                    _betweenness *= scale
+                betweenness[node] = _betweenness
+
+        return _sna_feature_frame(relation, in_degree, out_degree, closeness, betweenness)
+
+    def update(self, alloc_df, predicted_links_dict):
+        with self.lock:
+            feature_list = []
+            for relation, links in predicted_links_dict.items():
+                cached = self.partitions.get(relation, {})
+                current = {}
+                recomputed = []
+                for cls, edges in self._partition_edges(alloc_df, links).items():
+                    edge_key = tuple(edges)
+                    if cls in cached and cached[cls][0] == edge_key:
+                        current[cls] = cached[cls]
+                    else:
+                        current[cls] = (edge_key, self._raw_stats(edges))
+                        recomputed.append(cls)
+
+                self.partitions[relation] = current
+                self.last_recomputed[relation] = recomputed
+                feature_list.append(self._relation_frame(relation, current))
+
+            return _assemble_sna_features(feature_list)
 
 
 # === Step 3: Define wellbeing scoring ===
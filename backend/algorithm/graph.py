@@ -0,0 +1,151 @@
+import sys
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+# ==============================
+# Array-backed multi-relation graph over participants
+# Built once per pipeline run from the relation sheets and shared by the consumers
+# (SNA features, baseline enrichment, RGCN edge index, plots, agent graph).
+# Per relation:
+#   src, dst       int32 participant positions of every edge, in input order (duplicates kept,
+#                  as the RGCN edge index and the plots use them)
+#   nodes          int32 participant positions of the nodes that have an edge in this relation,
+#                  in first-appearance order (the node order of nx.from_pandas_edgelist)
+#   indptr/indices int32 CSR over those local nodes, duplicate edges collapsed (nx.DiGraph)
+# Views (csr, edge_index, ...) share these arrays instead of copying them.
+# ==============================
+
+class RelationGraph:
+    def __init__(self, participant_ids, relations: dict):
+        self.participant_ids = np.asarray(participant_ids)
+        self.index = pd.Index(self.participant_ids)
+        self.relations = relations   # relation -> {"src", "dst", "nodes", "indptr", "indices"}
+        max_nnz = max((len(r["indices"]) for r in relations.values()), default=0)
+        self._ones = np.ones(max_nnz, dtype=np.float64)   # shared CSR data for all relations
+
+    # ------------------------------
+    # Construction
+    # ------------------------------
+    @classmethod
+    def from_edges(cls, net_dict: dict, participant_ids = None):
+        """
+        net_dict: {relation: DataFrame(Source, Target) or list of (u, v)}.
+        participant_ids fixes the first positions (e.g. the survey index); endpoints not in it
+        are appended in first-appearance order.
+        """
+        pairs = {}
+        for relation, edges in net_dict.items():
+            if isinstance(edges, pd.DataFrame):
+                pairs[relation] = (edges['Source'].to_numpy(), edges['Target'].to_numpy())
+            else:
+                pairs[relation] = (np.asarray([u for u, _ in edges]), np.asarray([v for _, v in edges]))
+
+        ids = pd.Index(pd.unique(np.asarray(participant_ids))) if participant_ids is not None else pd.Index([])
+        endpoints = [np.column_stack([s, t]).ravel() for s, t in pairs.values() if len(s)]
+        if endpoints:
+            seen = pd.unique(np.concatenate(endpoints))
+            extra = seen[ids.get_indexer(seen) < 0]
+            if len(extra):
+                ids = ids.append(pd.Index(extra))
+
+        relations = {}
+        for relation, (s, t) in pairs.items():
+            relations[relation] = cls._build_relation(ids.get_indexer(s).astype(np.int32),
+                                                      ids.get_indexer(t).astype(np.int32))
+        return cls(ids.to_numpy(), relations)
+
+    @classmethod
+    def from_edge_table(cls, edge_df: pd.DataFrame, participant_ids = None, relation_col = "Relation"):
+        """
+        Long edge table (Source, Target, Relation), relations in first-appearance order. Edges are
+        grouped by relation (input order within a relation); rows without a relation form a NaN group.
+        """
+        net_dict = {relation: group for relation, group in edge_df.groupby(relation_col, sort=False, dropna=False)}
+        return cls.from_edges(net_dict, participant_ids)
+
+    @staticmethod
+    def _build_relation(src, dst):
+        # local node order = first appearance in (u0, v0, u1, v1, ...)
+        if len(src):
+            nodes = pd.unique(np.column_stack([src, dst]).ravel()).astype(np.int32)
+        else:
+            nodes = np.empty(0, dtype=np.int32)
+        local = np.full(int(max(src.max(), dst.max())) + 1 if len(src) else 0, -1, dtype=np.int32)
+        local[nodes] = np.arange(len(nodes), dtype=np.int32)
+
+        A = sp.csr_matrix((np.ones(len(src), dtype=np.float64), (local[src], local[dst])),
+                          shape=(len(nodes), len(nodes)))
+        A.sum_duplicates()
+        return {
+            "src": src,
+            "dst": dst,
+            "nodes": nodes,
+            "indptr": A.indptr.astype(np.int32, copy=False),
+            "indices": A.indices.astype(np.int32, copy=False),
+        }
+
+    # ------------------------------
+    # Views
+    # ------------------------------
+    @property
+    def n(self) -> int:
+        return len(self.participant_ids)
+
+    def __contains__(self, relation) -> bool:
+        return relation in self.relations
+
+    def __iter__(self):
+        return iter(self.relations)
+
+    def nodes(self, relation) -> np.ndarray:
+        return self.relations[relation]["nodes"]
+
+    def node_ids(self, relation) -> np.ndarray:
+        return self.participant_ids[self.relations[relation]["nodes"]]
+
+    def csr(self, relation) -> sp.csr_matrix:
+        """
+        0/1 adjacency over the relation's nodes (see nodes()), sharing the stored arrays.
+        """
+        r = self.relations[relation]
+        size = len(r["nodes"])
+        return sp.csr_matrix((self._ones[:len(r["indices"])], r["indices"], r["indptr"]),
+                             shape=(size, size), copy=False)
+
+    def edge_positions(self, relation):
+        """
+        (src, dst) participant positions in input order.
+        """
+        r = self.relations[relation]
+        return r["src"], r["dst"]
+
+    def edge_ids(self, relation):
+        src, dst = self.edge_positions(relation)
+        return self.participant_ids[src], self.participant_ids[dst]
+
+    def edge_frame(self, relation) -> pd.DataFrame:
+        source, target = self.edge_ids(relation)
+        return pd.DataFrame({"Source": source, "Target": target})
+
+    def to_networkx(self, directed: bool = True, multigraph: bool = False, relations = None):
+        """
+        NetworkX graph with a 'relation' attribute per edge, edges added relation by relation in input order.
+        """
+        import networkx as nx
+        graph_type = {(True, True): nx.MultiDiGraph, (True, False): nx.DiGraph,
+                      (False, True): nx.MultiGraph, (False, False): nx.Graph}[(directed, multigraph)]
+        G = graph_type()
+        for relation in (relations if relations is not None else self.relations):
+            if relation not in self.relations:
+                continue
+            source, target = self.edge_ids(relation)
+            G.add_edges_from(zip(source.tolist(), target.tolist()), relation=relation)
+        return G
+
+    def nbytes(self) -> int:
+        arrays = sum(a.nbytes for r in self.relations.values() for a in r.values())
+        ids = self.participant_ids.nbytes
+        if self.participant_ids.dtype == object:
+            ids += sum(sys.getsizeof(pid) for pid in self.participant_ids)
+        return arrays + ids + self._ones.nbytes
@@ -0,0 +1,224 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from ortools.sat.python import cp_model
+from algorithm.cp_sat import (aggregate_pair_weights, add_tie_objective_terms, class_size_bounds,
+                              canonical_class_labels, compute_student_coefficients,
+                              solve_allocation_model, ALLOCATION_OBJECTIVES)
+from algorithm.local_search import local_search_allocation
+
+# ==============================
+# Large Neighbourhood Search over the CP-SAT allocation model
+# Start from an allocation (local search by default), then per round:
+#   - split the classes at random into disjoint groups of classes_per_neighbourhood classes
+#   - free the students of each group (at most max_free_students of them, favouring students tied
+#     to another class of the group) and re-solve only them with CP-SAT, everyone else fixed
+#   - the groups share no class, so their sub-solves run in parallel and their gains add up
+# A freed student can only land in one of the group's classes, so ties to students outside the
+# group never change: a sub-model only holds the pairs inside the group (pair tie encoding, no
+# symmetry breaking, hinted with the current placement; worse results are discarded).
+# Stops at the time limit or after `patience` rounds without improvement.
+# ==============================
+LNS_WORKERS = int(os.getenv("LNS_WORKERS", "0"))   # 0 = one thread per neighbourhood (up to the CPU count)
+
+
+def lns_stats(rounds, sub_solves, objective, seconds, stop_reason, trace):
+    # Trace as two flat lists so the stats can be stored as ProcessRun properties
+    return {
+        "lns_rounds": rounds,
+        "lns_sub_solves": sub_solves,
+        "lns_objective": objective,
+        "lns_seconds": round(seconds, 2),
+        "lns_stop_reason": stop_reason,
+        "lns_trace_seconds": [t for t, _ in trace],
+        "lns_trace_objective": [value for _, value in trace],
+    }
+
+
+def _solve_neighbourhood(freed, group, u, v, w, classes, min_size, max_size, solver_params):
+    """
+    Re-solve the `freed` students among the classes in `group`; the other students of the group
+    keep their class. (u, v, w) are the pairs with both students in the group.
+    Returns (gain, freed, new classes) or None.
+    """
+    local = np.full(len(classes), -1, dtype=np.int64)
+    local[freed] = np.arange(len(freed))
+    position = {c: j for j, c in enumerate(group)}
+
+    # Pairs of freed students become tie terms, ties to a fixed student of the group become a
+    # linear bonus for the freed student in that student's class
+    lu, lv = local[u], local[v]
+    both = (lu >= 0) & (lv >= 0)
+    links = [(a, b, "tie", weight) for a, b, weight in zip(lu[both].tolist(), lv[both].tolist(), w[both].tolist())]
+    bonus = np.zeros((len(freed), len(group)), dtype=np.int64)
+    for mine, other in ((lu, v), (lv, u)):
+        rows = (mine >= 0) & (local[other] < 0)
+        np.add.at(bonus, (mine[rows], [position[c] for c in classes[other[rows]].tolist()]), w[rows])
+
+    model = cp_model.CpModel()
+    assign = np.empty((len(freed), len(group)), dtype=object)
+    for i, s in enumerate(freed):
+        for j, c in enumerate(group):
+            assign[i, j] = model.NewBoolVar(f'student_{s}_class_{c}')
+            model.AddHint(assign[i, j], bool(classes[s] == c))
+        model.AddExactlyOne(assign[i].tolist())
+
+    fixed = np.bincount(classes[np.setdiff1d(np.flatnonzero(np.isin(classes, group)), freed)],
+                        minlength=max(group) + 1)
+    for j, c in enumerate(group):
+        model.AddLinearConstraint(cp_model.LinearExpr.Sum(assign[:, j].tolist()),
+                                  max(0, min_size - int(fixed[c])), max_size - int(fixed[c]))
+
+    tie_vars, tie_weights = add_tie_objective_terms(model, assign, range(len(group)), links, "pair")
+    rows, cols = np.nonzero(bonus)
+    model.Maximize(cp_model.LinearExpr.WeightedSum(tie_vars + assign[rows, cols].tolist(),
+                                                   tie_weights + bonus[rows, cols].tolist()))
+
+    result = solve_allocation_model(model, assign, **solver_params)
+    if result is None:
+        return None
+
+    new_classes = classes.copy()
+    new_classes[freed] = np.asarray(group)[[j for _, j in result]]
+    before = int(w[classes[u] == classes[v]].sum())
+    after = int(w[new_classes[u] == new_classes[v]].sum())
+    return after - before, freed, new_classes[freed]
+
+
+def lns_allocation(df, n_classes, enriched_links, objective="balanced", tolerance=0.1,
+                   max_time_in_seconds=60, symmetry_breaking=False, hint=None, initial=None,
+                   classes_per_neighbourhood=3, max_free_students=60, sub_time_in_seconds=1,
+                   patience=30, workers=None,
+                   seed=42, stats=None, **objective_params):
+    """
+    Returns [(student_idx, class)] like cpsat_allocation, or None when no allocation meets the
+    class-size bounds. `initial` is one class label (0..n_classes-1) per student; without it the
+    start is local_search_allocation from `hint`. Neighbourhoods larger than max_free_students
+    free only that many of their students, the others keep their class. `stats` (dict) receives
+    lns_stats, including the objective trace after every round.
+    """
+    started = time.perf_counter()
+    deadline = started + max_time_in_seconds
+    coefficients = compute_student_coefficients(df, objective, **objective_params)
+    constant = int(coefficients.sum())
+    n_students = len(df)
+    min_size, max_size = class_size_bounds(n_students, n_classes, tolerance)
+
+    if initial is None:
+        start = local_search_allocation(df, n_classes, enriched_links, objective=objective,
+                                        tolerance=tolerance, max_time_in_seconds=max_time_in_seconds / 4,
+                                        hint=hint, seed=seed, **objective_params)
+        if start is None:
+            return None
+        initial = [label for _, label in start]
+    classes = np.asarray(initial, dtype=np.int64)
+    sizes = np.bincount(classes, minlength=n_classes)
+    if len(classes) != n_students or len(sizes) != n_classes or sizes.min() < min_size or sizes.max() > max_size:
+        raise ValueError("initial allocation does not meet the class-size bounds")
+
+    pair_weights_dict = {pair: weight for pair, weight in aggregate_pair_weights(enriched_links).items()
+                         if 0 <= pair[0] < n_students and 0 <= pair[1] < n_students}
+    pairs = np.array(list(pair_weights_dict), dtype=np.int64).reshape(-1, 2)
+    pair_weights = np.fromiter(pair_weights_dict.values(), dtype=np.int64, count=len(pair_weights_dict))
+
+    def tie_objective():
+        return int(pair_weights[classes[pairs[:, 0]] == classes[pairs[:, 1]]].sum())
+
+    solver_params = dict(ALLOCATION_OBJECTIVES[objective]["solver"])
+    solver_params["num_search_workers"] = 1   # parallelism comes from the disjoint neighbourhoods
+    k = max(2, min(classes_per_neighbourhood, n_classes))
+    n_groups = n_classes // k
+    workers = max(1, workers or LNS_WORKERS or min(n_groups, os.cpu_count() or 1))
+
+    rng = np.random.default_rng(seed)
+    current = tie_objective()
+    trace = [(round(time.perf_counter() - started, 2), current + constant)]
+    rounds = sub_solves = stale = 0
+    stop_reason = "time_limit"
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0.1:
+                break
+            if stale >= patience:
+                stop_reason = "no_improvement"
+                break
+            # Sub-solves beyond the worker count queue up, so split what is left between the waves
+            waves = -(-n_groups // workers)
+            solver_params["max_time_in_seconds"] = min(sub_time_in_seconds, remaining / waves)
+
+            # Groups of k classes; the leftover classes (fewer than k) sit this round out
+            order = rng.permutation(n_classes)
+            groups = [order[g * k:(g + 1) * k].tolist() for g in range(n_groups)]
+            in_group = np.full(n_classes, -1, dtype=np.int64)
+            for g, group in enumerate(groups):
+                in_group[group] = g
+            pair_group = np.where(in_group[classes[pairs[:, 0]]] == in_group[classes[pairs[:, 1]]],
+                                  in_group[classes[pairs[:, 0]]], -1)
+
+            futures = []
+            for g, group in enumerate(groups):
+                rows = pair_group == g
+                members = np.flatnonzero(in_group[classes] == g)
+                if len(members) > max_free_students:
+                    # Favour students tied to another class of the group: those are the ones a
+                    # re-solve can move profitably
+                    cross = rows & (classes[pairs[:, 0]] != classes[pairs[:, 1]])
+                    pull = np.bincount(pairs[cross].ravel(), weights=np.abs(np.repeat(pair_weights[cross], 2)),
+                                       minlength=n_students)[members] + 1
+                    members = np.sort(rng.choice(members, max_free_students, replace=False, p=pull / pull.sum()))
+                futures.append(pool.submit(_solve_neighbourhood, members, group,
+                                           pairs[rows, 0], pairs[rows, 1], pair_weights[rows], classes,
+                                           min_size, max_size, dict(solver_params)))
+
+            gain = 0
+            for future in futures:
+                result = future.result()
+                sub_solves += 1
+                if result is None or result[0] <= 0:
+                    continue
+                gain += result[0]
+                classes[result[1]] = result[2]
+
+            rounds += 1
+            current += gain
+            stale = 0 if gain > 0 else stale + 1
+            trace.append((round(time.perf_counter() - started, 2), current + constant))
+
+    seconds = time.perf_counter() - started
+    print(f"LNS: objective {trace[0][1]} -> {current + constant} in {rounds} rounds "
+          f"({sub_solves} sub-solves, {seconds:.1f}s, {stop_reason})")
+    if stats is not None:
+        stats.update(lns_stats(rounds, sub_solves, current + constant, seconds, stop_reason, trace))
+
+    labels = classes.tolist()
+    if symmetry_breaking:
+        labels = canonical_class_labels(labels, n_classes)
+    return list(enumerate(labels))
+
+
+def lns_wellbeing_and_ties_allocation(df, n_classes, enriched_links, wellbeing_weight=1, tolerance=0.1, tie_encoding="product", max_time_in_seconds=20, symmetry_breaking=False, hint=None, stats=None):
+    # Sub-models always use the pair encoding; tie_encoding is accepted for signature parity
+    return lns_allocation(
+        df, n_classes, enriched_links, objective="balanced", tolerance=tolerance,
+        max_time_in_seconds=max_time_in_seconds, symmetry_breaking=symmetry_breaking, hint=hint,
+        stats=stats, wellbeing_weight=wellbeing_weight
+    )
+
+
+def lns_mode_allocator(objective):
+    """
+    LNS counterpart of a mode's CP-SAT allocator (same keyword arguments).
+    """
+    default_time = ALLOCATION_OBJECTIVES[objective]["solver"]["max_time_in_seconds"]
+
+    def allocate(df, n_classes, enriched_links, tolerance=0.1, symmetry_breaking=False, hint=None,
+                 max_time_in_seconds=default_time, stats=None, **objective_params):
+        return lns_allocation(
+            df, n_classes, enriched_links, objective=objective, tolerance=tolerance,
+            max_time_in_seconds=max_time_in_seconds, symmetry_breaking=symmetry_breaking, hint=hint,
+            stats=stats, **objective_params
+        )
+    return allocate
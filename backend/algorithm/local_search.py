@@ -0,0 +1,213 @@
+import math
+import time
+import numpy as np
+from algorithm.cp_sat import (aggregate_pair_weights, class_size_bounds, canonical_class_labels,
+                              compute_student_coefficients, ALLOCATION_OBJECTIVES)
+
+# ==============================
+# Local-search allocator (simulated annealing over moves and swaps)
+# Same inputs/outputs and class-size bounds as the CP-SAT allocators, for cohorts where CP-SAT
+# only reaches FEASIBLE within its time limit.
+# Objective: the CP-SAT objective. Each student's wellbeing coefficient does not depend on the
+# class (it folds into a constant), so only the net tie weight of pairs sharing a class moves.
+# gain[s, c] = sum of pair weights between s and the students currently in class c, so
+#   move s: a -> b       delta = gain[s, b] - gain[s, a]                                 O(1)
+#   swap s (a) <-> t (b) delta = move(s) + move(t) - 2 w(s, t)                           O(1)
+# and applying a move updates gain for the neighbours of s only                          O(deg)
+# ==============================
+
+def _pair_adjacency(enriched_links, n_students):
+    """
+    Symmetric CSR (indptr, neighbours, weights) of the net pair weights, plus the pair dict.
+    """
+    pair_weights = {pair: weight for pair, weight in aggregate_pair_weights(enriched_links).items()
+                    if 0 <= pair[0] < n_students and 0 <= pair[1] < n_students}
+    if not pair_weights:
+        return np.zeros(n_students + 1, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0), pair_weights
+
+    pairs = np.array(list(pair_weights), dtype=np.int64)
+    weights = np.fromiter(pair_weights.values(), dtype=np.float64, count=len(pair_weights))
+    src = np.concatenate([pairs[:, 0], pairs[:, 1]])
+    dst = np.concatenate([pairs[:, 1], pairs[:, 0]])
+    both = np.concatenate([weights, weights])
+
+    order = np.argsort(src, kind="stable")
+    indptr = np.searchsorted(src[order], np.arange(n_students + 1))
+    return indptr, dst[order], both[order], pair_weights
+
+
+def _initial_classes(n_students, n_classes, hint):
+    """
+    Hint labels renumbered like the CP-SAT hint (first appearance), students without one
+    spread round-robin; sizes are repaired afterwards.
+    """
+    classes = np.arange(n_students, dtype=np.int64) % n_classes
+    if hint is not None:
+        labels = canonical_class_labels(list(hint)[:n_students], n_classes)
+        for s, label in enumerate(labels):
+            if label is not None:
+                classes[s] = label
+    return classes
+
+
+def _repair_sizes(classes, gain, n_classes, min_size, max_size):
+    """
+    Move students out of classes above max_size and into classes below min_size, each time
+    the student whose move loses the least tie weight.
+    """
+    sizes = np.bincount(classes, minlength=n_classes)
+    while (sizes > max_size).any() or (sizes < min_size).any():
+        over = np.flatnonzero(sizes > max_size)
+        under = np.flatnonzero(sizes < min_size)
+        source = over[0] if len(over) else int(np.argmax(sizes))
+        target = under[0] if len(under) else int(np.argmin(sizes))
+        candidates = np.flatnonzero(classes == source)
+        s = candidates[np.argmax(gain[candidates, target] - gain[candidates, source])]
+        yield s, source, target
+        sizes[source] -= 1
+        sizes[target] += 1
+
+
+def local_search_allocation(df, n_classes, enriched_links, objective="balanced", tolerance=0.1,
+                            max_time_in_seconds=20, symmetry_breaking=False, hint=None, seed=42,
+                            max_iterations=None, patience=None, **objective_params):
+    """
+    Simulated annealing over single-student moves (when both class sizes allow it) and swaps.
+    Stops after max_iterations (default 400 per student), after `patience` iterations without a
+    new best (default 50 per student) or at the time limit. Returns [(student_idx, class)] like
+    cpsat_allocation, or None when the class-size bounds cannot be met.
+    """
+    # Same validation as the CP-SAT model (e.g. missing wellbeing scores); the sum is a constant
+    coefficients = compute_student_coefficients(df, objective, **objective_params)
+    n_students = len(df)
+    min_size, max_size = class_size_bounds(n_students, n_classes, tolerance)
+    if n_students == 0 or not (n_classes * min_size <= n_students <= n_classes * max_size):
+        return None
+
+    indptr, neighbours, weights, pair_weights = _pair_adjacency(enriched_links, n_students)
+    classes = _initial_classes(n_students, n_classes, hint)
+
+    gain = np.zeros((n_students, n_classes), dtype=np.float64)
+    src = np.repeat(np.arange(n_students), np.diff(indptr))
+    np.add.at(gain, (src, classes[neighbours]), weights)
+
+    def apply_move(s, a, b):
+        lo, hi = indptr[s], indptr[s + 1]
+        if hi > lo:
+            gain[neighbours[lo:hi], a] -= weights[lo:hi]
+            gain[neighbours[lo:hi], b] += weights[lo:hi]
+        classes[s] = b
+
+    for s, a, b in _repair_sizes(classes, gain, n_classes, min_size, max_size):
+        apply_move(s, a, b)
+
+    # members[c] with positions for O(1) removal
+    members = [list(np.flatnonzero(classes == c)) for c in range(n_classes)]
+    position = np.empty(n_students, dtype=np.int64)
+    for c in range(n_classes):
+        for i, s in enumerate(members[c]):
+            position[s] = i
+    sizes = np.array([len(m) for m in members])
+
+    def relocate(s, a, b):
+        last = members[a].pop()
+        if last != s:
+            members[a][position[s]] = last
+            position[last] = position[s]
+        position[s] = len(members[b])
+        members[b].append(s)
+        apply_move(s, a, b)
+
+    current = float(gain[np.arange(n_students), classes].sum()) / 2
+    start_value = best = current
+    best_classes = classes.copy()
+
+    max_iterations = max_iterations or 400 * n_students
+    patience = patience or 50 * n_students
+    # Start accepting a typical loss half of the time, cool geometrically to 1/1000 of that
+    t_start = (np.median(np.abs(weights)) if len(weights) else 1.0) / math.log(2)
+    cooling = math.log(1e-3) / max(1, max_iterations)
+
+    rng = np.random.default_rng(seed)
+    deadline = time.perf_counter() + max_time_in_seconds
+    last_best = 0
+    iteration = 0
+    block = 4096
+    for iteration in range(max_iterations):
+        i = iteration % block
+        if i == 0:
+            draws = rng.random((block, 5))
+            if time.perf_counter() > deadline:
+                break
+        if iteration - last_best > patience:
+            break
+        u_student, u_guide, u_class, u_partner, u_accept = draws[i]
+
+        s = int(u_student * n_students)
+        a = classes[s]
+        lo, hi = indptr[s], indptr[s + 1]
+        # Half of the proposals target the class of a random neighbour
+        if hi > lo and u_guide < 0.5:
+            b = classes[neighbours[lo + int(u_guide * 2 * (hi - lo))]]
+        else:
+            b = int(u_class * n_classes)
+        if b == a:
+            continue
+
+        if sizes[a] > min_size and sizes[b] < max_size:
+            t = -1
+            delta = gain[s, b] - gain[s, a]
+        else:
+            t = members[b][int(u_partner * len(members[b]))]
+            w = pair_weights.get((s, t) if s < t else (t, s), 0)
+            delta = gain[s, b] - gain[s, a] + gain[t, a] - gain[t, b] - 2 * w
+
+        temperature = t_start * math.exp(cooling * iteration)
+        if delta < 0 and u_accept >= math.exp(delta / temperature):
+            continue
+
+        relocate(s, a, b)
+        if t >= 0:
+            relocate(t, b, a)
+        else:
+            sizes[a] -= 1
+            sizes[b] += 1
+        current += delta
+
+        if current > best + 1e-9:
+            best = current
+            best_classes[:] = classes
+            last_best = iteration
+
+    print(f"Local search: tie objective {start_value:.0f} -> {best:.0f} "
+          f"(+ constant {int(coefficients.sum())}) after {iteration + 1} iterations")
+
+    labels = best_classes.tolist()
+    if symmetry_breaking:
+        labels = canonical_class_labels(labels, n_classes)
+    return list(enumerate(labels))
+
+
+def local_search_wellbeing_and_ties_allocation(df, n_classes, enriched_links, wellbeing_weight=1, tolerance=0.1, tie_encoding="product", max_time_in_seconds=20, symmetry_breaking=False, hint=None):
+    # tie_encoding only changes the CP-SAT model, not the objective
+    return local_search_allocation(
+        df, n_classes, enriched_links, objective="balanced", tolerance=tolerance,
+        max_time_in_seconds=max_time_in_seconds, symmetry_breaking=symmetry_breaking, hint=hint,
+        wellbeing_weight=wellbeing_weight
+    )
+
+
+def local_search_mode_allocator(objective):
+    """
+    Local-search counterpart of a mode's CP-SAT allocator (same keyword arguments).
+    """
+    default_time = ALLOCATION_OBJECTIVES[objective]["solver"]["max_time_in_seconds"]
+
+    def allocate(df, n_classes, enriched_links, tolerance=0.1, symmetry_breaking=False, hint=None,
+                 max_time_in_seconds=default_time, **objective_params):
+        return local_search_allocation(
+            df, n_classes, enriched_links, objective=objective, tolerance=tolerance,
+            max_time_in_seconds=max_time_in_seconds, symmetry_breaking=symmetry_breaking, hint=hint,
+            **objective_params
+        )
+    return allocate
@@ -4,10 +4,10 @@ import torch.nn as nn
 import torch.nn.functional as F
 import torch.optim as optim
 from sklearn.model_selection import train_test_split
+import time
 import random
+import threading
 import numpy as np
-from algorithm.utils import set_seed
-set_seed(42)
 
 class MultilabelLinkModel(nn.Module):
     def __init__(self, input_dim, hidden_dim, num_classes, dropout=0.1):
@@ -61,66 +61,264 @@ def train_multilabel_link_predictor(X, Y, hidden_dim=128, epochs=100, lr=0.0001)
             print(f"Epoch {epoch} | Train Loss: {loss.item():.4f} | Val Loss: {val_loss.item():.4f}")
             model.train()
 
+    if stats is not None:
+        stats.update(link_training_stats("full_batch", epochs, val_loss.item(), time.perf_counter() - start, "max_epochs"))
+    return model
+
+
+def link_training_stats(mode, epochs, val_loss, seconds, stop_reason):
+    """
+    Summary of a link model training run, stored on the ProcessRun.
+    """
+    return {
+        "link_training_mode": mode,
+        "link_epochs": int(epochs),
+        "link_val_loss": float(val_loss),
+        "link_train_seconds": round(float(seconds), 3),
+        "link_stop_reason": stop_reason,
+    }
+
+
+def train_multilabel_link_classifier_minibatch(X, Y, hidden_dim=128, max_epochs=200, lr=0.001, batch_size=512,
+                                               patience=10, min_delta=1e-4, time_budget=120.0,
+                                               relation_to_label=None, seed=42, stats: dict = None):
+    """
+    Shuffled mini-batch training with validation-based early stopping and a wall-clock budget (seconds).
+    Stops after `patience` epochs without a val loss improvement of at least min_delta, after
+    max_epochs, or once time_budget is spent; the weights of the best validation epoch are returned.
+    If stats is given it is filled with the training summary (see link_training_stats).
+    """
+    input_dim = X.size(1)
+    num_classes = Y.size(1)
+
+    model = MultilabelLinkModel(input_dim, hidden_dim, num_classes)
+    optimizer = torch.optim.Adam(model.parameters(), lr=lr)
+    criterion = nn.BCEWithLogitsLoss(reduction='none')
+
+    X_train, X_val, Y_train, Y_val = train_test_split(X, Y, test_size=0.3, random_state=42)
+    weight_multiplier = relation_loss_weights(num_classes, relation_to_label)
+
+    # Own generator: shuffling does not consume the global torch RNG
+    generator = torch.Generator().manual_seed(seed)
+    n_train = X_train.size(0)
+    start = time.perf_counter()
+
+    best_loss, best_state, best_epoch = float("inf"), None, 0
+    stop_reason, epoch = "max_epochs", 0
+    for epoch in range(1, max_epochs + 1):
+        model.train()
+        permutation = torch.randperm(n_train, generator=generator)
+        for i in range(0, n_train, batch_size):
+            batch = permutation[i:i + batch_size]
+            if len(batch) < 2 and n_train > 1:
+                continue   # BatchNorm needs more than one row
+            optimizer.zero_grad()
+            loss = (criterion(model(X_train[batch]), Y_train[batch]) * weight_multiplier).mean()
+            loss.backward()
+            optimizer.step()
+
+        model.eval()
+        with torch.no_grad():
+            val_loss = (criterion(model(X_val), Y_val) * weight_multiplier).mean().item()
+
+        if val_loss < best_loss - min_delta:
+            best_loss, best_epoch = val_loss, epoch
+            best_state = {k: v.detach().clone() for k, v in model.state_dict().items()}
+
+        if epoch % 10 == 0 or epoch == 1:
+            print(f"Epoch {epoch} | Train Loss: {loss.item():.4f} | Val Loss: {val_loss:.4f}")
+
+        if epoch - best_epoch >= patience:
+            stop_reason = "early_stopping"
+            break
+        if time.perf_counter() - start >= time_budget:
+            stop_reason = "time_budget"
+            break
+
+    if best_state is not None:
+        model.load_state_dict(best_state)
+    model.eval()
+    seconds = time.perf_counter() - start
+    print(f"Link model: {epoch} epochs ({stop_reason}), best val loss {best_loss:.4f} at epoch {best_epoch}, {seconds:.1f}s")
+
+    if stats is not None:
+        stats.update(link_training_stats("minibatch", epoch, best_loss, seconds, stop_reason))
     return model
 
 def predict_multilabel_links_using_embeddings_and_classes(
     embeddings, model, relation_list, 
     alloc_df, 
     same_class_threshold=0.5, 
-    diff_class_threshold=0.9
+    diff_class_threshold=0.9,
+    chunk_size=32768
 ):
     """
     Predict multilabel links with additional constraints.
     - Friends and Disrespect cannot coexist.
     - Disrespect can only be predicted with Influential.
     """
+    n = embeddings.size(0)
+    class_labels = alloc_df['Assigned_Class'].loc[range(n)].to_numpy()
+
+    return predict_links_batched(
+        embeddings, model, relation_list, class_labels,
+        same_class_threshold=same_class_threshold,
+        diff_class_threshold=diff_class_threshold,
+        chunk_size=chunk_size
+    )
+
+# ==============================
+# Batched all-pairs link scoring
+# ==============================
+def iter_link_probability_chunks(embeddings, model, chunk_size=32768):
+    """
+    Score every ordered (u, v) pair with the link model, one forward pass per chunk.
+    Yields (row_start, row_end, probs) where probs has shape (row_end - row_start, n, num_relations).
+    chunk_size is the number of pairs per forward pass and bounds peak memory.
+    """
     model.eval()
-    predicted_links = {rel: [] for rel in relation_list}
+    n = embeddings.size(0)
+    rows_per_chunk = max(1, chunk_size // max(n, 1))
 
     with torch.no_grad():
-        n = embeddings.size(0)
-        for u in range(n):
-            for v in range(n):
-                if u == v:
-                    continue  # Skip self-loops
-                feature = torch.cat([embeddings[u], embeddings[v]]).unsqueeze(0)  # Concatenate embeddings
-                logits = model(feature)  # Model output (logits)
-                probs = torch.sigmoid(logits).squeeze(0)  # Apply sigmoid to get probabilities
+        for row_start in range(0, n, rows_per_chunk):
+            row_end = min(row_start + rows_per_chunk, n)
+            n_rows = row_end - row_start
 
-                same_class = alloc_df.loc[u]['Assigned_Class'] == alloc_df.loc[v]['Assigned_Class']
+            src = embeddings[row_start:row_end].repeat_interleave(n, dim=0)
+            dst = embeddings.repeat(n_rows, 1)
+            logits = model(torch.cat([src, dst], dim=1))
+            probs = torch.sigmoid(logits).view(n_rows, n, -1)
 
-                # Apply thresholds based on class relation
-                threshold = same_class_threshold if same_class else diff_class_threshold
+            yield row_start, row_end, probs.numpy()
 
-                # Apply the constraints for each pair of students (u, v)
-                valid_prediction = True
+def threshold_link_probabilities(probs, relation_list, src_classes, dst_classes,
+                                 same_class_threshold=0.5, diff_class_threshold=0.9):
+    """
+    Vectorised thresholding of a (rows, cols, num_relations) probability block.
+    Returns a boolean mask of the same shape with the relation constraints applied:
+    - Friends and Disrespect cannot coexist.
+    - Disrespect can only be predicted with Influential.
+    """
+    same_class = np.asarray(src_classes)[:, None] == np.asarray(dst_classes)[None, :]
+    threshold = np.where(same_class, float(same_class_threshold), float(diff_class_threshold))
 
-                # Constraint 1: Friends and Disrespect cannot both be predicted at the same time
-                if probs[relation_list.index("friends")].item() >= threshold and probs[relation_list.index("disrespect")].item() >= threshold:
-                    valid_prediction = False
+    # Compare in float64 so the result matches the scalar `prob.item() >= threshold` check
+    above = probs >= threshold[:, :, None]
 
-                # Constraint 2: Disrespect can only be predicted if Influential is also predicted
-                if probs[relation_list.index("disrespect")].item() >= threshold and probs[relation_list.index("influential")].item() < threshold:
-                    valid_prediction = False
+    friends = above[:, :, relation_list.index("friends")]
+    disrespect = above[:, :, relation_list.index("disrespect")]
+    influential = above[:, :, relation_list.index("influential")]
+    valid = ~(friends & disrespect) & ~(disrespect & ~influential)
 
-                # If no constraints are violated, add the link prediction
-                if valid_prediction:
-                    for idx, prob in enumerate(probs):
-                        if prob.item() >= threshold:
-                            predicted_links[relation_list[idx]].append((u, v))
+    return above & valid[:, :, None]
 
-    return predicted_links
+def predict_links_batched(embeddings, model, relation_list, class_labels,
+                          same_class_threshold=0.5, diff_class_threshold=0.9,
+                          chunk_size=32768):
+    """
+    Batched replacement for the per-pair scoring loop.
+    class_labels[i] is the class of embedding row i. Returns {relation: [(u, v), ...]}
+    with pairs ordered by u then v, exactly like the original double loop.
+    """
+    class_labels = np.asarray(class_labels)
+    predicted_links = {rel: [] for rel in relation_list}
 
-def train_multilabel_link_classifier(X, Y, hidden_dim=128, epochs=400, lr=0.00001, relation_to_label=None):
-    input_dim = X.size(1)
-    num_classes = Y.size(1)
+    for row_start, row_end, probs in iter_link_probability_chunks(embeddings, model, chunk_size):
+        mask = threshold_link_probabilities(
+            probs, relation_list, class_labels[row_start:row_end], class_labels,
+            same_class_threshold, diff_class_threshold
+        )
+        # Skip self-loops
+        rows = np.arange(row_end - row_start)
+        mask[rows, rows + row_start, :] = False
 
-    model = MultilabelLinkModel(input_dim, hidden_dim, num_classes)
-    optimizer = torch.optim.Adam(model.parameters(), lr=lr)
-    criterion = nn.BCEWithLogitsLoss(reduction='none')  # No reduction for custom weighting
+        for idx, rel in enumerate(relation_list):
+            u_idx, v_idx = np.nonzero(mask[:, :, idx])
+            predicted_links[rel].extend(zip((u_idx + row_start).tolist(), v_idx.tolist()))
 
-    X_train, X_val, Y_train, Y_val = train_test_split(X, Y, test_size=0.3, random_state=42)
+    return predicted_links
 
+def compute_link_probabilities(embeddings, model, chunk_size=32768):
+    """
+    Full (n, n, num_relations) sigmoid probability tensor for every ordered pair.
+    Probabilities only depend on the embeddings and the link model, not on the allocation.
+    """
+    n = embeddings.size(0)
+    probs = None
+    for row_start, row_end, block in iter_link_probability_chunks(embeddings, model, chunk_size):
+        if probs is None:
+            probs = np.empty((n, n, block.shape[2]), dtype=block.dtype)
+        probs[row_start:row_end] = block
+    return probs
+
+class LinkThresholdCache:
+    """
+    Keeps the pairwise probability tensor of a trained link model together with the
+    thresholded link mask of the last allocation seen. When the allocation changes only
+    the rows and columns of the students whose class changed are re-thresholded.
+    """
+    def __init__(self, probs, relation_list, same_class_threshold=0.5, diff_class_threshold=0.9):
+        self.probs = probs
+        self.relation_list = list(relation_list)
+        self.same_class_threshold = same_class_threshold
+        self.diff_class_threshold = diff_class_threshold
+        self.class_labels = None
+        self.mask = None
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_model(cls, embeddings, model, relation_list, same_class_threshold=0.5,
+                   diff_class_threshold=0.9, chunk_size=32768):
+        probs = compute_link_probabilities(embeddings, model, chunk_size)
+        return cls(probs, relation_list, same_class_threshold, diff_class_threshold)
+
+    def _threshold(self, probs, src_classes, dst_classes):
+        return threshold_link_probabilities(
+            probs, self.relation_list, src_classes, dst_classes,
+            self.same_class_threshold, self.diff_class_threshold
+        )
+
+    def update_allocation(self, class_labels):
+        """
+        Bring the link mask in line with class_labels (positional, one per embedding row).
+        Returns the indices that had to be re-thresholded.
+        """
+        n = self.probs.shape[0]
+        class_labels = np.asarray(class_labels)[:n]
+
+        if self.mask is None:
+            self.mask = self._threshold(self.probs, class_labels, class_labels)
+            self.mask[np.arange(n), np.arange(n), :] = False
+            self.class_labels = class_labels.copy()
+            return np.arange(n)
+
+        changed = np.flatnonzero(self.class_labels != class_labels)
+        self.class_labels = class_labels.copy()
+
+        for i in changed:
+            self.mask[i] = self._threshold(self.probs[i:i + 1], class_labels[i:i + 1], class_labels)[0]
+            self.mask[:, i] = self._threshold(self.probs[:, i:i + 1], class_labels, class_labels[i:i + 1])[:, 0]
+            self.mask[i, i, :] = False
+
+        return changed
+
+    def predicted_links(self):
+        """
+        Current mask as {relation: [(u, v), ...]}, ordered like predict_links_batched.
+        """
+        predicted_links = {}
+        for idx, rel in enumerate(self.relation_list):
+            u_idx, v_idx = np.nonzero(self.mask[:, :, idx])
+            predicted_links[rel] = list(zip(u_idx.tolist(), v_idx.tolist()))
+        return predicted_links
+
+    def links_for_allocation(self, class_labels):
+        with self.lock:
+            self.update_allocation(class_labels)
+            return self.predicted_links()
+
+def relation_loss_weights(num_classes, relation_to_label=None):
     # --- Boosting Weights ---
     weight_multiplier = torch.ones(num_classes)
 
@@ -138,6 +336,26 @@ def train_multilabel_link_classifier(X, Y, hidden_dim=128, epochs=400, lr=0.0000
                 weight_multiplier[idx] = 1
             elif relation == "disrespect":
                 weight_multiplier[idx] = -5
+    return weight_multiplier
+
+
+def train_multilabel_link_classifier(X, Y, hidden_dim=128, epochs=400, lr=0.00001, relation_to_label=None,
+                                     stats: dict = None):
+    """
+    Full-batch training for a fixed number of epochs.
+    If stats is given it is filled with the training summary (see link_training_stats).
+    """
+    input_dim = X.size(1)
+    num_classes = Y.size(1)
+
+    model = MultilabelLinkModel(input_dim, hidden_dim, num_classes)
+    optimizer = torch.optim.Adam(model.parameters(), lr=lr)
+    criterion = nn.BCEWithLogitsLoss(reduction='none')  # No reduction for custom weighting
+
+    X_train, X_val, Y_train, Y_val = train_test_split(X, Y, test_size=0.3, random_state=42)
+
+    weight_multiplier = relation_loss_weights(num_classes, relation_to_label)
+    start = time.perf_counter()
 
     model.train()
     for epoch in range(epochs):
@@ -171,52 +389,55 @@ def build_link_prediction_dataset_with_negatives(
     num_negatives_per_positive=1,
     seed=42
 ):
+    """
+    Pair features [emb[u] | emb[v]] with multi-hot relation labels.
+    A (u, v) pair that appears under several relations (or several times) is one row with
+    every matching relation set; rows keep the order in which pairs first appear.
+    Negatives are the round-robin pairs (i, i+1) that are not positives, all labels 0.
+    """
     # Ensure reproducibility
     random.seed(seed)
     torch.manual_seed(seed)
     np.random.seed(seed)
 
-    X, y = [], []
     relation_to_label = {rel: idx for idx, rel in enumerate(relation_dict.keys())}
     num_classes = len(relation_to_label)
     n = embeddings.size(0)
 
-    # Positive samples
-    seen_pairs = set()
+    # Positive samples: (src, dst, label) index arrays
+    src, dst, lab = [], [], []
     for relation, edges in relation_dict.items():
-        label_idx = relation_to_label[relation]
-        for u, v in edges:
-            if u in id_to_idx and v in id_to_idx:
-                u_idx = id_to_idx[u]
-                v_idx = id_to_idx[v]
-                feature = torch.cat([embeddings[u_idx], embeddings[v_idx]])
-                
-                # Create a label vector where only the corresponding relation index is 1
-                label_vec = torch.zeros(num_classes)
-                label_vec[label_idx] = 1.0
-                X.append(feature)
-                y.append(label_vec)  # Add tensor instead of integer
-                seen_pairs.add((u_idx, v_idx))
-
-    n_positives = len(X)
-
-    # Negative samples - deterministic sampling (no randomness)
-    all_student_indices = list(range(n))
-    num_negatives = n_positives * num_negatives_per_positive
-
-    # Use round-robin to pair students deterministically
-    for i in range(num_negatives):
-        u = all_student_indices[i % len(all_student_indices)]
-        v = all_student_indices[(i + 1) % len(all_student_indices)]  # Ensure distinct pairs
-        if u != v and (u, v) not in seen_pairs:
-            feature = torch.cat([embeddings[u], embeddings[v]])
-            
-            # Negative sample has all labels as 0
-            label_vec = torch.zeros(num_classes)
-            X.append(feature)
-            y.append(label_vec)  # Add tensor instead of integer
-            seen_pairs.add((u, v))
-
-    X = torch.stack(X)  # Stack features
-    y = torch.stack(y)  # Stack labels as tensors
+        pairs = [(id_to_idx[u], id_to_idx[v]) for u, v in edges if u in id_to_idx and v in id_to_idx]
+        if pairs:
+            pairs = np.asarray(pairs, dtype=np.int64)
+            src.append(pairs[:, 0])
+            dst.append(pairs[:, 1])
+            lab.append(np.full(len(pairs), relation_to_label[relation], dtype=np.int64))
+    src = np.concatenate(src) if src else np.empty(0, dtype=np.int64)
+    dst = np.concatenate(dst) if dst else np.empty(0, dtype=np.int64)
+    lab = np.concatenate(lab) if lab else np.empty(0, dtype=np.int64)
+
+    # One row per distinct pair, in first-appearance order
+    pair_key = src * n + dst
+    unique_keys, first_pos, row_of_edge = np.unique(pair_key, return_index=True, return_inverse=True)
+    order = np.argsort(first_pos, kind="stable")
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    pos_src, pos_dst = src[first_pos[order]], dst[first_pos[order]]
+    n_positives = len(order)
+
+    # Negative samples - deterministic round-robin (i, i+1); only the first n pairs are distinct
+    num_negatives = min(n_positives * num_negatives_per_positive, n)
+    neg_src = np.arange(num_negatives, dtype=np.int64)
+    neg_dst = (neg_src + 1) % n
+    keep = (neg_src != neg_dst) & ~np.isin(neg_src * n + neg_dst, unique_keys)
+    neg_src, neg_dst = neg_src[keep], neg_dst[keep]
+
+    # One gather for all rows, labels by scatter
+    all_src = torch.from_numpy(np.concatenate([pos_src, neg_src]))
+    all_dst = torch.from_numpy(np.concatenate([pos_dst, neg_dst]))
+    X = torch.cat([embeddings[all_src], embeddings[all_dst]], dim=1)
+
+    y = torch.zeros(len(all_src), num_classes)
+    y[torch.from_numpy(rank[row_of_edge.reshape(-1)]), torch.from_numpy(lab)] = 1.0
     return X, y, relation_to_label
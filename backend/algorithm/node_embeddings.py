@@ -10,8 +10,7 @@ import matplotlib.pyplot as plt
 import pandas as pd
 import numpy as np
 import random
-from algorithm.utils import set_seed
-set_seed(42)
+from algorithm.graph import RelationGraph
 
 
 # --- Build HeteroData object ---
@@ -30,13 +29,26 @@ def build_hetero_data(survey_df, net_dict):
     # --- Edges ---
     edge_index_all = []
     edge_type_all = []
-    relation_types = list(net_dict.keys())
+    relation_types = list(net_dict)
 
-    for rel_id, (rel, df) in enumerate(net_dict.items()):
-        edges = [(id_to_idx[src], id_to_idx[tgt]) for src, tgt in zip(df['Source'], df['Target'])
-                 if src in id_to_idx and tgt in id_to_idx]
-        if edges:
-            e_idx = torch.tensor(edges, dtype=torch.long).t().contiguous()
+    if isinstance(net_dict, RelationGraph):
+        # graph position -> row of survey_df (-1 if not a surveyed participant)
+        to_row = np.full(net_dict.n, -1, dtype=np.int64)
+        positions = net_dict.index.get_indexer(survey_df.index)
+        to_row[positions[positions >= 0]] = np.flatnonzero(positions >= 0)
+
+    for rel_id, rel in enumerate(net_dict):
+        if isinstance(net_dict, RelationGraph):
+            src, dst = net_dict.edge_positions(rel)
+            src, dst = to_row[src], to_row[dst]
+            keep = (src >= 0) & (dst >= 0)
+            e_idx = torch.from_numpy(np.stack([src[keep], dst[keep]]))
+        else:
+            df = net_dict[rel]
+            edges = [(id_to_idx[src], id_to_idx[tgt]) for src, tgt in zip(df['Source'], df['Target'])
+                     if src in id_to_idx and tgt in id_to_idx]
+            e_idx = torch.tensor(edges, dtype=torch.long).t().contiguous() if edges else torch.empty((2, 0), dtype=torch.long)
+        if e_idx.size(1):
             edge_index_all.append(e_idx)
             edge_type_all.append(torch.full((e_idx.size(1),), rel_id, dtype=torch.long))
 
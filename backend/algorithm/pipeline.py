@@ -0,0 +1,542 @@
+import os
+import time
+import pandas as pd
+import torch
+import joblib
+from sklearn.preprocessing import LabelEncoder
+
+from algorithm.feature_engineer import (compute_sna_features_from_graphs, enrich_student_data,
+                                        build_updated_net_dict, compute_predicted_wellbeing_scores)
+from algorithm.node_embeddings import build_hetero_data, train_model
+from algorithm.graph import RelationGraph
+from algorithm.multilink_prediction import (MultilabelLinkModel, build_link_prediction_dataset_with_negatives,
+                                            train_multilabel_link_classifier, train_multilabel_link_classifier_minibatch,
+                                            predict_multilabel_links_using_embeddings_and_classes)
+from algorithm.cp_sat import (build_enriched_links, apply_thresholds_from_classes, allocation_hint, hint_within_bounds,
+                              cpsat_wellbeing_and_ties_allocation, cpsat_academic_allocation,
+                              cpsat_mental_allocation, cpsat_social_allocation)
+from algorithm.local_search import local_search_wellbeing_and_ties_allocation, local_search_mode_allocator
+from algorithm.lns import lns_wellbeing_and_ties_allocation, lns_mode_allocator
+from algorithm.utils import set_seed
+from algorithm.artifacts import cached_stage
+from algorithm.survey_predictor import fit_survey_predictor, predict_survey_outcomes
+from algorithm.stages import run_stages, format_stage_timings
+
+# ==============================
+# Mode profiles
+# ==============================
+# Input sheet per relation
+RELATION_SHEETS = {
+    "friends": "net_0_friends",
+    "influential": "net_1_influential",
+    "feedback": "net_2_feedback",
+    "moretime": "net_3_moretime",
+    "advice": "net_4_advice",
+    "disrespect": "net_5_disrespect",
+}
+
+# Relation order used to build the link dataset (fixes the link model's output columns)
+LINK_RELATION_ORDER = ["friends", "advice", "moretime", "influential", "disrespect", "feedback"]
+
+# Tie weights the dominant-score modes give CP-SAT instead of build_enriched_links' defaults
+DYNAMIC_LINK_WEIGHTS = {
+    "mutual_friend": 10000000,
+    "oneway_friend": 50000,
+    "bully": -70000000,
+    "victim": -70000000,
+    "advice": 20000000,
+    "moretime": 1000,
+    "feedback": 1000,
+    "influential": 2000,
+}
+DEFAULT_DYNAMIC_LINK_WEIGHT = 500
+
+_DOMINANT_MODE_BASE = {
+    # relationship_weights order is also the net_dict / feature order
+    "relationship_weights": {"friends": 2, "advice": 3, "disrespect": -3, "moretime": 3, "influential": 1.5, "feedback": 1.5},
+    "same_class_threshold": 0.53,
+    "diff_class_threshold": 0.69,
+    "link_weights": DYNAMIC_LINK_WEIGHTS,
+    # these modes always refresh df.csv / Y_pred_df.csv
+    "write_outputs": True,
+}
+
+MODE_PROFILES = {
+    "balanced": {
+        "relationship_weights": {"friends": 2, "advice": 3, "disrespect": -3, "moretime": 3, "influential": 1.5},
+        "same_class_threshold": 0.54,
+        "diff_class_threshold": 0.67,
+        "allocator": cpsat_wellbeing_and_ties_allocation,
+        "local_search_allocator": local_search_wellbeing_and_ties_allocation,
+        "lns_allocator": lns_wellbeing_and_ties_allocation,
+        "link_weights": None,
+        "score_offsets": None,
+        "write_outputs": False,
+    },
+    "academic": {**_DOMINANT_MODE_BASE, "allocator": cpsat_academic_allocation,
+                 "local_search_allocator": local_search_mode_allocator("academic"),
+                 "lns_allocator": lns_mode_allocator("academic"),
+                 "score_offsets": {"social_score": -3, "academic_score": 2, "mental_score": -3}},
+    "mental": {**_DOMINANT_MODE_BASE, "allocator": cpsat_mental_allocation,
+               "local_search_allocator": local_search_mode_allocator("mental"),
+               "lns_allocator": lns_mode_allocator("mental"),
+               "score_offsets": {"social_score": -3, "academic_score": -3, "mental_score": 2}},
+    "social": {**_DOMINANT_MODE_BASE, "allocator": cpsat_social_allocation,
+               "local_search_allocator": local_search_mode_allocator("social"),
+               "lns_allocator": lns_mode_allocator("social"),
+               "score_offsets": {"social_score": 2, "academic_score": -3, "mental_score": -3}},
+}
+
+N_CLASSES = 11
+
+# Hyperparameters of the training stages (also part of the stage cache keys)
+SURVEY_PREDICTOR_PARAMS = {"n_estimators": 100, "random_state": 42}
+EMBEDDING_PARAMS = {"hidden_dim": 64, "out_dim": 32, "epochs": 100, "lr": 0.01}
+LINK_MODEL_PARAMS = {"hidden_dim": 128, "epochs": 400, "lr": 0.00001}
+LINK_MINIBATCH_PARAMS = {"hidden_dim": 128, "max_epochs": 200, "lr": 0.001, "batch_size": 512,
+                         "patience": 10, "min_delta": 1e-4,
+                         "time_budget": float(os.getenv("PIPELINE_LINK_TIME_BUDGET", "120"))}
+# "full_batch": fixed 400 epochs (matches earlier runs); "minibatch": early stopping + time budget
+LINK_TRAINING = os.getenv("PIPELINE_LINK_TRAINING", "full_batch")
+
+# Concurrent prepare stages and their thread budget (0 = derive from the CPU count)
+STAGE_WORKERS = int(os.getenv("PIPELINE_STAGE_WORKERS", "3"))
+SKLEARN_JOBS = int(os.getenv("PIPELINE_SKLEARN_JOBS", "0"))
+TORCH_THREADS = int(os.getenv("PIPELINE_TORCH_THREADS", "0"))
+# Allocation engine: "lns" (local search refined by CP-SAT neighbourhoods), "local_search" or "cpsat"
+# (the single CP-SAT model, the engine before lns became the default). Tie objective on the
+# 166-student test cohort, mode time limits:
+#   balanced  cpsat none found (20 s)   local_search 17587 (0.6 s)   lns 17587 (20 s)
+#   academic  cpsat 4.83e9 (40 s)       local_search 1.617e10 (0.4 s) lns 1.637e10 (40 s)
+# lns never ends below its local-search start and stops early once rounds stop improving.
+ALLOCATION_ENGINE = os.getenv("PIPELINE_ALLOCATION_ENGINE", "lns")
+# "multioutput" keeps the survey_predictor.pkl format; "native" trains a single multi-output forest
+SURVEY_PREDICTOR_BACKEND = os.getenv("PIPELINE_SURVEY_PREDICTOR_BACKEND", "multioutput")
+# Tie terms of the cpsat engine's model: "product" (one variable per link and class) or "pair"
+# (one variable per linked pair, see add_tie_objective_terms)
+TIE_ENCODING = os.getenv("PIPELINE_TIE_ENCODING", "product")
+# Class symmetry breaking for CP-SAT is opt-in: on the 166-student test cohort (PIPELINE_TIE_ENCODING=pair,
+# 20 s) it reached 8222 against 8323 without it
+SYMMETRY_BREAKING = os.getenv("PIPELINE_SYMMETRY_BREAKING", "false").lower() == "true"
+
+
+def stage_thread_budget():
+    """
+    Split the cores between the RF fit (sklearn jobs) and RGCN training (torch intra-op
+    threads) while they overlap, so the two do not oversubscribe the machine.
+    """
+    cpus = os.cpu_count() or 1
+    sklearn_jobs = SKLEARN_JOBS or max(1, cpus // 2)
+    torch_threads = TORCH_THREADS or max(1, cpus - sklearn_jobs)
+    return sklearn_jobs, torch_threads
+
+
+def get_mode_profile(mode):
+    if isinstance(mode, dict):
+        return mode
+    if mode not in MODE_PROFILES:
+        raise ValueError(f"Unknown allocation mode '{mode}', expected one of {list(MODE_PROFILES)}")
+    return MODE_PROFILES[mode]
+
+
+def select_allocator(profile, engine = None):
+    """
+    (engine name, allocator) for a mode profile.
+    """
+    engine = engine or ALLOCATION_ENGINE
+    if engine == "local_search":
+        return engine, profile["local_search_allocator"]
+    if engine == "lns":
+        return engine, profile["lns_allocator"]
+    if engine == "cpsat":
+        return engine, profile["allocator"]
+    raise ValueError(f"Unknown allocation engine '{engine}'")
+
+
+def apply_link_weights(enriched_links, link_weights, default_weight=DEFAULT_DYNAMIC_LINK_WEIGHT):
+    """
+    Replace the weights of (u, v, relation, weight) tuples by relation.
+    """
+    return [(u, v, relation, link_weights.get(relation, default_weight))
+            for u, v, relation, _ in enriched_links]
+
+
+# ==============================
+# Pipeline
+# ==============================
+class AllocationPipeline:
+    """
+    Survey + relationship sheets -> trained predictor, embeddings and link model (prepare)
+    -> CP-SAT allocation and evaluation for one or more modes (solve).
+    Modes with the same relationship weights share the prepared state, and modes with the
+    same thresholds also share the pre-allocation link prediction.
+    """
+    def __init__(self, file_input_dict: dict[str, pd.DataFrame], mode = "balanced"):
+        self.file_input_dict = file_input_dict
+        self.relationship_weights = dict(get_mode_profile(mode)["relationship_weights"])
+        self.prepared = False
+        self._allocation_inputs = {}
+        self.stage_times = {}   # stage name -> wall seconds
+        self.link_training_stats = {}
+        self.allocation_stats = {}   # LNS rounds and objective trace of the last solve
+
+    def supports(self, mode) -> bool:
+        return get_mode_profile(mode)["relationship_weights"] == self.relationship_weights
+
+    # ==============================
+    # Step 1: Prepare (features + training)
+    # ==============================
+    def prepare(self):
+        if self.prepared:
+            return self
+        # Seed per run rather than at import (torch determinism flags are process-global)
+        set_seed(42)
+        file_input_dict = self.file_input_dict
+        relationship_weights = self.relationship_weights
+        relations = list(relationship_weights)
+
+        #----------------------------LOAD DATA----------------------------#
+        survey_outcome = file_input_dict["survey_data"].copy()
+        survey_outcome.set_index("Participant-ID", inplace=True)
+
+        survey_outcome_raw = file_input_dict["survey_data"].copy()
+        survey_outcome_raw = survey_outcome_raw.set_index('Participant-ID')
+
+        net_affiliation = file_input_dict["net_affiliation"]
+        net_dict = {relation: file_input_dict[RELATION_SHEETS[relation]] for relation in relations}
+        # One array-backed graph of all relations for the feature, baseline and RGCN stages
+        # (net_dict stays the stage cache key)
+        graph = RelationGraph.from_edges(net_dict, participant_ids=survey_outcome.index)
+
+        sklearn_jobs, torch_threads = stage_thread_budget()
+
+        # === Training data ===
+        def training_data(results):
+            X_train = compute_sna_features_from_graphs(graph, relationship_weights)
+            Y_train = survey_outcome_raw.drop(columns=['Current_Class'], errors='ignore').fillna(0)
+            X_train = X_train.loc[Y_train.index]  # Align index
+            return X_train, Y_train
+
+        # Baseline score from raw survey + SNA
+        def baseline(results):
+            df_enriched = enrich_student_data(survey_outcome_raw, graph, net_affiliation)
+            score_before = df_enriched[['academic_score', 'mental_score', 'social_score']]
+            print("Baseline Wellbeing (Before Allocation):")
+            print(score_before.mean())
+            return score_before
+
+        # === Survey predictor ===
+        # Training stages are cached by content (inputs + hyperparameters), so another mode on the
+        # same survey reuses them in a warm worker
+        def survey_predictor(results):
+            X_train, Y_train = results["training_data"]
+
+            def fit():
+                # RF trees are seeded by random_state, so n_jobs does not change the model
+                return fit_survey_predictor(X_train, Y_train, SURVEY_PREDICTOR_PARAMS,
+                                            backend=SURVEY_PREDICTOR_BACKEND, n_jobs=sklearn_jobs)
+
+            model = cached_stage("survey_predictor", (X_train, Y_train),
+                                 {**SURVEY_PREDICTOR_PARAMS, "backend": SURVEY_PREDICTOR_BACKEND}, fit,
+                                 uses_global_rng=False)
+
+            # Save model + columns
+            joblib.dump(model, 'survey_predictor.pkl')
+            joblib.dump(list(X_train.columns), 'survey_predictor_columns.pkl')
+            print("Model saved as 'survey_predictor.pkl'")
+            print("Feature columns saved as 'survey_predictor_columns.pkl'")
+            return model
+
+        def encoded_survey(results):
+            # Multi Encoding Club
+            club_df = pd.get_dummies(net_affiliation.set_index("Participant-ID")["Activity"]) \
+                         .groupby(level=0).max() \
+                         .astype(int)
+            encoded = survey_outcome.join(club_df, how='left').fillna(0).astype(int)
+
+            # Encoding Classroom
+            onehot_classes = pd.get_dummies(encoded['Current_Class'], prefix='Class')\
+                         .groupby(level=0).max() \
+                         .astype(int)
+            encoded = encoded.join(onehot_classes)
+            print(encoded.info())
+
+            # Encode labels
+            if 'encoded_class' not in encoded.columns:
+                encoder = LabelEncoder()
+                encoded['encoded_class'] = encoder.fit_transform(encoded['Current_Class'])
+            return encoded
+
+        # === RGCN embeddings ===
+        # The only stage of the concurrent group that draws from the global RNG
+        def embeddings_stage(results):
+            encoded = results["encoded_survey"]
+            set_seed(42)
+            data, num_relations = build_hetero_data(encoded, graph)
+            num_classes = encoded['encoded_class'].nunique()
+            embeddings = cached_stage("embeddings", (encoded, net_dict), {**EMBEDDING_PARAMS, "num_classes": num_classes},
+                                      lambda: train_model(data, num_relations=num_relations, num_classes=num_classes, **EMBEDDING_PARAMS))
+            print(embeddings.shape)
+            return embeddings
+
+        # === Multilabel link model ===
+        def link_model(results):
+            embeddings = results["embeddings"]
+            id_to_idx = {pid: idx for idx, pid in enumerate(results["encoded_survey"].index)}
+            relation_dict = {
+                relation: list(zip(net_dict[relation]['Source'], net_dict[relation]['Target']))
+                for relation in LINK_RELATION_ORDER if relation in net_dict
+            }
+
+            def train_link_model():
+                X, Y, relation_to_label = build_link_prediction_dataset_with_negatives(
+                    embeddings,
+                    relation_dict,
+                    id_to_idx
+                )
+                # Not trained itself, but its weight init advances the torch RNG that the
+                # classifier below starts from; kept so trained models match earlier runs
+                MultilabelLinkModel(input_dim=embeddings.size(1)*2, hidden_dim=128, num_classes=len(relation_to_label))
+                stats = {"link_training_rows": int(X.size(0))}
+                if LINK_TRAINING == "minibatch":
+                    model = train_multilabel_link_classifier_minibatch(X, Y, stats=stats, **LINK_MINIBATCH_PARAMS)
+                else:
+                    model = train_multilabel_link_classifier(X, Y, stats=stats, **LINK_MODEL_PARAMS)
+                return model, relation_to_label, stats
+
+            params = LINK_MINIBATCH_PARAMS if LINK_TRAINING == "minibatch" else LINK_MODEL_PARAMS
+            return cached_stage("link_model", (embeddings, relation_dict, id_to_idx),
+                                {**params, "training": LINK_TRAINING}, train_link_model)
+
+        # RF fit, baseline enrichment and RGCN training do not depend on each other
+        stages = {
+            "training_data": {"deps": [], "run": training_data},
+            "baseline": {"deps": [], "run": baseline},
+            "encoded_survey": {"deps": [], "run": encoded_survey},
+            "survey_predictor": {"deps": ["training_data"], "run": survey_predictor},
+            "embeddings": {"deps": ["encoded_survey"], "run": embeddings_stage},
+            "link_model": {"deps": ["embeddings"], "run": link_model},
+        }
+
+        previous_torch_threads = torch.get_num_threads()
+        torch.set_num_threads(torch_threads)
+        start = time.perf_counter()
+        try:
+            results, timings = run_stages(stages, max_workers=STAGE_WORKERS)
+        finally:
+            torch.set_num_threads(previous_torch_threads)
+        wall_seconds = time.perf_counter() - start
+        self.stage_times.update({name: t["seconds"] for name, t in timings.items()})
+        print("Pipeline stage timings:")
+        print(format_stage_timings(stages, timings, wall_seconds))
+
+        X_train, Y_train = results["training_data"]
+        survey_outcome = results["encoded_survey"]
+        multilabel_link_model, relation_to_label, link_training_stats = results["link_model"]
+
+        self.survey_outcome = survey_outcome
+        self.survey_outcome_raw = survey_outcome_raw
+        self.net_affiliation = net_affiliation
+        self.score_before = results["baseline"]
+        self.X_train_columns = list(X_train.columns)
+        self.Y_train_columns = list(Y_train.columns)
+        self.model = results["survey_predictor"]
+        self.embeddings = results["embeddings"]
+        self.multilabel_link_model = multilabel_link_model
+        self.relation_to_label = relation_to_label
+        self.link_training_stats = dict(link_training_stats)
+        self.relation_list = list(relation_to_label.keys())
+        self.graph = graph
+        self.student_ids = survey_outcome.index.tolist()
+        self.index_to_id = dict(enumerate(self.student_ids))
+        self.prepared = True
+        return self
+
+    # ==============================
+    # Step 2: Pre-allocation links (shared by modes with the same thresholds)
+    # ==============================
+    def allocation_inputs(self, same_class_threshold, diff_class_threshold):
+        key = (same_class_threshold, diff_class_threshold)
+        if key not in self._allocation_inputs:
+            # Initial allocation using Current_Class
+            initial_alloc_df = self.survey_outcome_raw[['Current_Class']].copy()
+            initial_alloc_df.columns = ['Assigned_Class']
+            initial_alloc_df.index = range(len(initial_alloc_df))
+
+            predicted_links = predict_multilabel_links_using_embeddings_and_classes(
+                self.embeddings,
+                self.multilabel_link_model,
+                relation_list=self.relation_list,
+                alloc_df=initial_alloc_df,
+                same_class_threshold=same_class_threshold,
+                diff_class_threshold=diff_class_threshold
+            )
+            df_enriched_updated = enrich_student_data(self.survey_outcome, predicted_links, self.net_affiliation)
+            enriched_links = build_enriched_links(predicted_links)
+            self._allocation_inputs[key] = (df_enriched_updated, enriched_links)
+        return self._allocation_inputs[key]
+
+    # ==============================
+    # Step 3: Allocate + evaluate one mode
+    # ==============================
+    def solve(self, mode = "balanced", visualize: bool = False, save_csv: bool = False,
+              hint_allocation: pd.Series = None) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+        profile = get_mode_profile(mode)
+        if not self.supports(profile):
+            raise ValueError(f"Mode '{mode}' uses different relationship weights than this pipeline was prepared with")
+        self.prepare()
+
+        same_t, diff_t = profile["same_class_threshold"], profile["diff_class_threshold"]
+        df_enriched_updated, enriched_links = self.allocation_inputs(same_t, diff_t)
+        if profile["link_weights"] is not None:
+            enriched_links = apply_link_weights(enriched_links, profile["link_weights"])
+
+        # Warm start from the last saved allocation (or Current_Class), only when its class sizes
+        # already meet the bounds: an out-of-bounds hint steers CP-SAT away from feasible allocations
+        # (Current_Class on the test cohort: 6913 with the hint, 8222 without, symmetry broken)
+        hint = allocation_hint(self.student_ids, self.survey_outcome_raw['Current_Class'], hint_allocation)
+        if not hint_within_bounds(hint, len(df_enriched_updated), N_CLASSES):
+            print("Allocation hint ignored: its class sizes are outside the bounds")
+            hint = None
+
+        engine, allocator = select_allocator(profile)
+        print(f"Allocation engine: {engine} ({len(df_enriched_updated)} students)")
+        self.allocation_stats = {}
+        engine_kwargs = {"lns": {"stats": self.allocation_stats},
+                         "cpsat": {"tie_encoding": TIE_ENCODING}}.get(engine, {})
+        start = time.perf_counter()
+        allocation_result = allocator(
+            df_enriched_updated,
+            n_classes=N_CLASSES,
+            enriched_links=enriched_links,
+            symmetry_breaking=SYMMETRY_BREAKING,
+            hint=hint,
+            **engine_kwargs
+        )
+        # CP-SAT can run out of time before its first solution; local search needs no solver
+        if allocation_result is None and engine != "local_search":
+            print(f"Allocation engine {engine} found no allocation, falling back to local_search")
+            engine = "local_search"
+            allocation_result = profile["local_search_allocator"](
+                df_enriched_updated,
+                n_classes=N_CLASSES,
+                enriched_links=enriched_links,
+                symmetry_breaking=SYMMETRY_BREAKING,
+                hint=hint
+            )
+        self.stage_times[f"allocate:{mode}"] = time.perf_counter() - start
+        if allocation_result is None:
+            raise RuntimeError(f"No feasible allocation found within the time limit ({mode} mode, {engine} engine)")
+        start = time.perf_counter()
+
+        # CP-SAT output -> alloc_df indexed by student id
+        index_to_id = self.index_to_id
+        alloc_df = pd.DataFrame(allocation_result, columns=["Student_idx", "Assigned_Class"])
+        alloc_df["Student_ID"] = alloc_df["Student_idx"].map(index_to_id)
+        alloc_df = alloc_df.set_index("Student_ID")
+        alloc_df = alloc_df.sort_index()
+
+        # Reapply thresholds after new allocation
+        predicted_links = apply_thresholds_from_classes(
+            embeddings=self.embeddings,
+            model=self.multilabel_link_model,
+            relation_list=self.relation_list,
+            alloc_df=alloc_df,
+            same_class_threshold=same_t,
+            diff_class_threshold=diff_t
+        )
+        for rel, edges in predicted_links.items():
+            print(f"{rel}: {len(edges)}")
+
+        #----------------------------Evaluate using Random forest regressor ----------------------------#
+        updated_net_dict = build_updated_net_dict(alloc_df, predicted_links)
+
+        X_post = compute_sna_features_from_graphs(updated_net_dict, self.relationship_weights).fillna(0)
+        X_post = X_post.reindex(columns=self.X_train_columns, fill_value=0)
+        X_post.index = alloc_df.index
+
+        Y_pred = predict_survey_outcomes(self.model, X_post)
+        Y_pred_df = pd.DataFrame(Y_pred, index=X_post.index, columns=self.Y_train_columns).fillna(0)
+        Y_pred_df.index = alloc_df.index
+
+        predicted_wellbeing_df = compute_predicted_wellbeing_scores(Y_pred_df).fillna(0)
+        predicted_wellbeing_df.index = alloc_df.index
+        for column, offset in (profile["score_offsets"] or {}).items():
+            predicted_wellbeing_df[column] += offset
+
+        print('Before Allocation')
+        print(self.score_before.mean())
+
+        print('After Allocation')
+        print(predicted_wellbeing_df.mean())
+
+        predicted_links_named = {
+            relation: [(index_to_id[u], index_to_id[v]) for u, v in edges]
+            for relation, edges in predicted_links.items()
+        }
+
+        if visualize:
+            from algorithm.visualise import visualize_predicted_network_colored
+            visualize_predicted_network_colored(predicted_links_named, alloc_df=alloc_df, title="Predicted Student Network Colored by Class (after CP-SAT)")
+
+        df_final = X_post.copy()
+        df_final = df_final.merge(predicted_wellbeing_df, left_index=True, right_index=True)
+
+        df_SNA = df_final.merge(predicted_wellbeing_df, left_index=True, right_index=True)
+        df_SNA = df_SNA.rename(columns={
+            'academic_score_x': 'academic_score',
+            'mental_score_x': 'mental_score',
+            'social_score_x': 'social_score'
+        }).drop(columns=['academic_score_y', 'mental_score_y', 'social_score_y'])
+
+        # Merge Assigned_Class into Y_pred_df
+        Y_pred_df = Y_pred_df.merge(alloc_df[['Assigned_Class']], left_index=True, right_index=True)
+
+        flattened = [(u, v, relation) for relation, pairs in predicted_links_named.items() for u, v in pairs]
+        predicted_link_df = pd.DataFrame(flattened, columns=["Source", "Target", "Relation"])
+
+        if save_csv or profile["write_outputs"]:
+            df_SNA.to_csv("df.csv", index_label="Participant_ID") #------ SNA score + Wellbeings
+            Y_pred_df.to_csv("Y_pred_df.csv", index_label="Participant_ID") #------ Predicted survey data + Assigned Class
+        if save_csv:
+            predicted_link_df.to_csv("predicted_links.csv", index=False) #------ Link prediction
+
+        self.save_model_bundle()
+        self.stage_times[f"evaluate:{mode}"] = time.perf_counter() - start
+
+        return df_SNA, Y_pred_df, predicted_link_df
+
+    def save_model_bundle(self, path = "agent_models_bundle.pkl"):
+        model_bundle = {
+            "survey_predictor": self.model,
+            "multilabel_link_model": self.multilabel_link_model,
+            "embeddings": self.embeddings,
+            "relation_to_label": self.relation_to_label,
+            "relationship_weights": self.relationship_weights,
+            "X_train_columns": self.X_train_columns,
+            "Y_train_columns": self.Y_train_columns,
+        }
+        joblib.dump(model_bundle, path)
+        print(f"{path} saved.")
+
+
+def run_allocation_mode(mode, file_input_dict: dict[str, pd.DataFrame], visualize: bool = True,
+                        save_csv: bool = True, hint_allocation: pd.Series = None):
+    return AllocationPipeline(file_input_dict, mode).solve(mode, visualize, save_csv, hint_allocation)
+
+
+def run_allocation_modes(modes, file_input_dict: dict[str, pd.DataFrame], visualize: bool = False,
+                         save_csv: bool = False, hint_allocation: pd.Series = None) -> dict:
+    """
+    Solve several modes in one job; modes with the same relationship weights share one prepared pipeline.
+    Returns {mode: (df_SNA, Y_pred_df, predicted_link_df)}.
+    """
+    pipelines = []
+    results = {}
+    for mode in modes:
+        pipeline = next((p for p in pipelines if p.supports(mode)), None)
+        if pipeline is None:
+            pipeline = AllocationPipeline(file_input_dict, mode)
+            pipelines.append(pipeline)
+        results[mode] = pipeline.solve(mode, visualize, save_csv, hint_allocation)
+    return results
@@ -0,0 +1,80 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+# ==============================
+# Minimal stage DAG runner
+# stages = {name: {"deps": [names...], "run": callable(results) -> value}}
+# Independent stages run concurrently in a thread pool (torch, sklearn trees and numpy
+# release the GIL in their heavy loops); each stage receives the results of all finished stages.
+# ==============================
+
+def topological_order(stages):
+    order, done = [], set()
+    pending = dict(stages)
+    while pending:
+        ready = [name for name, spec in pending.items() if all(dep in done for dep in spec.get("deps", []))]
+        if not ready:
+            raise ValueError(f"Stage graph has a cycle or unknown dependency: {sorted(pending)}")
+        for name in ready:
+            order.append(name)
+            done.add(name)
+            del pending[name]
+    return order
+
+
+def run_stages(stages, max_workers = 3):
+    """
+    Run the stage graph. Returns (results, timings), timings[name] = {"start", "end", "seconds"}
+    in seconds relative to the start of the run.
+    """
+    topological_order(stages)   # validate before starting anything
+    results, timings = {}, {}
+    t0 = time.perf_counter()
+
+    def execute(name):
+        start = time.perf_counter()
+        value = stages[name]["run"](results)
+        end = time.perf_counter()
+        timings[name] = {"start": start - t0, "end": end - t0, "seconds": end - start}
+        return value
+
+    remaining = dict(stages)
+    running = {}
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        while remaining or running:
+            for name in [n for n, spec in remaining.items() if all(dep in results for dep in spec.get("deps", []))]:
+                running[pool.submit(execute, name)] = name
+                del remaining[name]
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                except Exception:
+                    for other in running:
+                        other.cancel()
+                    raise
+
+    return results, timings
+
+
+def critical_path(stages, timings):
+    """
+    Longest chain of stage wall times through the dependency graph: (seconds, [names]).
+    """
+    best = {}
+    for name in topological_order(stages):
+        deps = stages[name].get("deps", [])
+        prev_seconds, prev_path = max((best[d] for d in deps), default=(0.0, []), key=lambda x: x[0])
+        best[name] = (prev_seconds + timings[name]["seconds"], prev_path + [name])
+    return max(best.values(), default=(0.0, []), key=lambda x: x[0])
+
+
+def format_stage_timings(stages, timings, wall_seconds):
+    lines = [f"  {name:<20} {t['seconds']:8.2f}s  [{t['start']:7.2f} -> {t['end']:7.2f}]"
+             for name, t in sorted(timings.items(), key=lambda kv: kv[1]["start"])]
+    path_seconds, path = critical_path(stages, timings)
+    lines.append(f"  wall {wall_seconds:.2f}s, sum of stages {sum(t['seconds'] for t in timings.values()):.2f}s, "
+                 f"critical path {path_seconds:.2f}s ({' -> '.join(path)})")
+    return "\n".join(lines)
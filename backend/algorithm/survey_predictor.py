@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed, parallel_backend
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.multioutput import MultiOutputRegressor
+# sklearn trees evaluate float32 inputs (sklearn.tree._tree.DTYPE)
+DTYPE = np.float32
+
+# ==============================
+# Survey predictor: SNA features -> survey outcomes
+# Backends:
+#   "multioutput" - MultiOutputRegressor(RandomForestRegressor), one forest per output (the format of
+#                   survey_predictor.pkl); the forests are fitted in parallel
+#   "native"      - a single multi-output RandomForestRegressor (one forest for all outputs, much
+#                   cheaper, but a different model: retrain rather than compare with old pickles)
+# Both pickle as plain sklearn estimators, so existing loaders keep working.
+# ==============================
+
+def fit_survey_predictor(X_train, Y_train, params: dict, backend: str = "multioutput", n_jobs: int = 1):
+    if backend == "native":
+        model = RandomForestRegressor(**params)
+    elif backend == "multioutput":
+        model = MultiOutputRegressor(RandomForestRegressor(**params))
+    else:
+        raise ValueError(f"Unknown survey predictor backend '{backend}'")
+
+    # Threads rather than processes: tree building releases the GIL and X/Y are not copied.
+    # The fitted estimators keep n_jobs=None, so the pickle is the same as a sequential fit
+    # and trees seeded by random_state are identical.
+    with parallel_backend("threading", n_jobs=n_jobs):
+        return model.fit(X_train, Y_train)
+
+
+def _forest_mean(forest, X32):
+    # Same accumulation order and division as RandomForestRegressor.predict (n_jobs=None),
+    # so the result is bitwise identical
+    n_outputs = forest.n_outputs_
+    y_hat = np.zeros((X32.shape[0], n_outputs) if n_outputs > 1 else X32.shape[0], dtype=np.float64)
+    for tree in forest.estimators_:
+        y_hat += tree.predict(X32, check_input=False)
+    y_hat /= len(forest.estimators_)
+    return y_hat
+
+
+def predict_survey_outcomes(model, X, n_jobs: int = 1) -> np.ndarray:
+    """
+    model.predict(X) for either backend, with the input validated/converted once for all
+    forests instead of once per output, and the per-output forests optionally evaluated in threads.
+    Returns an array of shape (n_rows, n_outputs).
+    """
+    X32 = np.ascontiguousarray(np.asarray(X, dtype=DTYPE))
+
+    if isinstance(model, MultiOutputRegressor):
+        forests = model.estimators_
+        if n_jobs == 1:
+            columns = [_forest_mean(forest, X32) for forest in forests]
+        else:
+            columns = Parallel(n_jobs=n_jobs, prefer="threads")(delayed(_forest_mean)(forest, X32) for forest in forests)
+        return np.column_stack(columns)
+
+    if isinstance(model, RandomForestRegressor):
+        y_hat = _forest_mean(model, X32)
+        return y_hat.reshape(X32.shape[0], -1)
+
+    return np.asarray(model.predict(X))
+
+
+def predict_allocation_batch(model, X_batch, columns = None, n_jobs: int = 1):
+    """
+    Evaluate the predictor over several candidate allocations in one pass.
+    X_batch: list of feature frames (one per candidate, same columns) or an array (n_candidates, n_students, n_features).
+    Returns a list of DataFrames (indexed like the input frames) or an array (n_candidates, n_students, n_outputs).
+    """
+    if isinstance(X_batch, np.ndarray):
+        n_candidates, n_students, n_features = X_batch.shape
+        Y = predict_survey_outcomes(model, X_batch.reshape(-1, n_features), n_jobs=n_jobs)
+        return Y.reshape(n_candidates, n_students, -1)
+
+    if not X_batch:
+        return []
+    sizes = [len(X) for X in X_batch]
+    Y = predict_survey_outcomes(model, np.vstack([np.asarray(X, dtype=DTYPE) for X in X_batch]), n_jobs=n_jobs)
+
+    results, offset = [], 0
+    for X, size in zip(X_batch, sizes):
+        results.append(pd.DataFrame(Y[offset:offset + size], index=getattr(X, "index", None), columns=columns))
+        offset += size
+    return results
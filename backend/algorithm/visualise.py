@@ -1,18 +1,13 @@
 import networkx as nx
 import seaborn as sns
 import matplotlib.pyplot as plt
-from algorithm.utils import set_seed
-set_seed(42)
+from algorithm.graph import RelationGraph
 
 def visualize_predicted_network_colored(predicted_links, alloc_df, title="Predicted Student Network Colored by Class"):
-    G = nx.Graph()
-    
-    
-
-    # Add edges
-    for relation, edges in predicted_links.items():
-        for u, v in edges:
-            G.add_edge(u, v, relation=relation)
+    # Undirected view; edges are added relation by relation, so a pair keeps its last relation
+    if not isinstance(predicted_links, RelationGraph):
+        predicted_links = RelationGraph.from_edges(predicted_links)
+    G = predicted_links.to_networkx(directed=False)
 
     # Add node attributes
     class_colors = {}
@@ -2,4 +2,23 @@ import os
 
 REDIS_HOST = os.getenv("REDIS_HOST", "redis")
 REDIS_PORT = int(os.getenv("REDIS_PORT", "6379"))
-DB_ENV_PATH = os.getenv("DB_ENV_PATH", "dataloading/db.env")
\ No newline at end of file
+DB_ENV_PATH = os.getenv("DB_ENV_PATH", "dataloading/db.env")
+
+# Neo4j driver pool (shared by API and worker)
+NEO4J_MAX_POOL_SIZE = int(os.getenv("NEO4J_MAX_POOL_SIZE", "50"))
+NEO4J_ACQUISITION_TIMEOUT = float(os.getenv("NEO4J_ACQUISITION_TIMEOUT", "30"))
+NEO4J_KEEP_ALIVE = os.getenv("NEO4J_KEEP_ALIVE", "true").lower() == "true"
+NEO4J_MAX_CONNECTION_LIFETIME = int(os.getenv("NEO4J_MAX_CONNECTION_LIFETIME", "3600"))
+# Seconds ensure_schema blocks startup for new indexes to come online, 0 = don't wait
+# (queries work meanwhile, they only use an index once it is online)
+NEO4J_SCHEMA_AWAIT_SECONDS = int(os.getenv("NEO4J_SCHEMA_AWAIT_SECONDS", "0"))
+
+# Dashboard metrics cache (seconds)
+METRICS_CACHE_TTL = int(os.getenv("METRICS_CACHE_TTL", "30"))
+
+# RQ worker: "fork" (stock rq.Worker, one work horse per job) or "warm" (jobs run in-process
+# with the algorithm stack and trained artifacts kept resident)
+WORKER_MODE = os.getenv("WORKER_MODE", "fork")
+WORKER_MAX_JOBS = int(os.getenv("WORKER_MAX_JOBS", "0"))            # recycle after N jobs, 0 = never
+WORKER_MAX_RSS_MB = int(os.getenv("WORKER_MAX_RSS_MB", "0"))        # recycle above this RSS, 0 = unbounded
+WORKER_ARTIFACT_CACHE_MB = float(os.getenv("WORKER_ARTIFACT_CACHE_MB", "1024"))   # stage cache size, 0 = off
@@ -1,17 +1,96 @@
 import dotenv
 import json
 import os
-from neo4j import GraphDatabase
+import re
+from neo4j import GraphDatabase, AsyncGraphDatabase
 import pandas as pd
+from config import (NEO4J_MAX_POOL_SIZE, NEO4J_ACQUISITION_TIMEOUT, NEO4J_KEEP_ALIVE,
+                    NEO4J_MAX_CONNECTION_LIFETIME)
 
-class DB:
+class CypherFiles:
+    """
+    Cypher file loading and rewriting, shared by DB and AsyncDB (no driver access).
+    """
     def __init__(self):
-        self.database = ""
-        self.driver: GraphDatabase.driver = None
         self.cypher_path = os.path.join(os.path.dirname(__file__), "cypher")
         self.cache = {}
+
+    def load_cypher(self, node_type = None, query_type = None, cypher_file_path = None):
+        print(f"Loading cypher for {node_type} with operation {query_type}")
+        if not cypher_file_path:
+            cypher_file_path = os.path.join(self.cypher_path, node_type, query_type + ".cql")
+        
+        if cypher_file_path in self.cache:
+            return self.cache[cypher_file_path] 
+        
+        if not os.path.isfile(cypher_file_path):
+            print("File not exists, cannot open. Check the path {cypher_file_path}")
+            return None
+
+        with open(cypher_file_path) as f:
+            cypher = f.read()
+        f.close()
+        
+        self.cache[cypher_file_path] = cypher
+
+        return cypher
     
-    def connect(self, file_name = "db.env"):
+    def load_cypher_relationship(self, relationship_name = None, query_type = None, cypher_file_path = None):
+        """
+        Load cypher for relationship based on the relationship name and query type.         
+        """
+        if relationship_name and query_type:
+            cypher_file_path = os.path.join(self.cypher_path, "relationship", relationship_name, query_type + ".cql")
+        elif cypher_file_path:
+            cypher_file_path = os.path.join(self.cypher_path, "relationship", cypher_file_path)
+        else:
+            raise ValueError("Either relationship_name and query_type or cypher_file_path must be provided.")
+        
+        if cypher_file_path in self.cache:
+            return self.cache[cypher_file_path]
+        
+        if not os.path.isfile(cypher_file_path):
+            print(f"File not exists, cannot open. Check the path {cypher_file_path}")
+            return None
+        with open(cypher_file_path) as f:
+            cypher = f.read()
+        f.close()
+        self.cache[cypher_file_path] = cypher
+
+        return cypher
+    
+
+    def to_unwind_cypher(self, cypher, rows_param = "rows", row_name = "row"):
+        """
+        Rewrite a single-row cypher into a batched one.
+        Every $param becomes row.param and the query runs once per element of $rows:
+            UNWIND $rows AS row MATCH (p {id: row.id}) ...
+        """
+        cache_key = ("unwind", cypher, rows_param, row_name)
+        if cache_key in self.cache:
+            return self.cache[cache_key]
+
+        body = cypher.strip().rstrip(";")
+        body = re.sub(r"\$(\w+)", lambda m: f"{row_name}.{m.group(1)}", body)
+        unwind_cypher = f"UNWIND ${rows_param} AS {row_name}\n{body}"
+
+        self.cache[cache_key] = unwind_cypher
+        return unwind_cypher
+
+
+class DB(CypherFiles):
+    def __init__(self):
+        super().__init__()
+        self.database = ""
+        self.driver: GraphDatabase.driver = None
+
+    def connect(self, file_name = "db.env", max_connection_pool_size = NEO4J_MAX_POOL_SIZE
+                , connection_acquisition_timeout = NEO4J_ACQUISITION_TIMEOUT, keep_alive = NEO4J_KEEP_ALIVE
+                , max_connection_lifetime = NEO4J_MAX_CONNECTION_LIFETIME):
+        """
+        Open one long-lived, pooled driver. The driver owns the connection pool and is
+        shared by every query until close() is called (FastAPI lifespan / worker exit).
+        """
         load_status = dotenv.load_dotenv(file_name)
         if load_status is False:
             raise RuntimeError('Environment variables not loaded.')
@@ -19,13 +98,20 @@ class DB:
         URI = os.getenv("NEO4J_URI")
         AUTH = (os.getenv("NEO4J_USERNAME"), os.getenv("NEO4J_PASSWORD"))
 
-        with GraphDatabase.driver(URI, auth=AUTH) as driver:
-            driver.verify_connectivity()
-            print("Connection established.")
-            self.driver = driver
+        self.driver = GraphDatabase.driver(
+            URI, auth=AUTH
+            , max_connection_pool_size=max_connection_pool_size
+            , connection_acquisition_timeout=connection_acquisition_timeout
+            , keep_alive=keep_alive
+            , max_connection_lifetime=max_connection_lifetime
+        )
+        self.driver.verify_connectivity()
+        print("Connection established.")
 
     def close(self):
-        self.driver.close()
+        if self.driver is not None:
+            self.driver.close()
+            self.driver = None
     
     def execute_query(self, cypher, params):
         records, summary, keys = None, None, None
@@ -66,51 +152,6 @@ class DB:
 
         return records, summary, keys
     
-    def load_cypher(self, node_type = None, query_type = None, cypher_file_path = None):
-        print(f"Loading cypher for {node_type} with operation {query_type}")
-        if not cypher_file_path:
-            cypher_file_path = os.path.join(self.cypher_path, node_type, query_type + ".cql")
-        
-        if cypher_file_path in self.cache:
-            return self.cache[cypher_file_path] 
-        
-        if not os.path.isfile(cypher_file_path):
-            print("File not exists, cannot open. Check the path {cypher_file_path}")
-            return None
-
-        with open(cypher_file_path) as f:
-            cypher = f.read()
-        f.close()
-        
-        self.cache[cypher_file_path] = cypher
-
-        return cypher
-    
-    def load_cypher_relationship(self, relationship_name = None, query_type = None, cypher_file_path = None):
-        """
-        Load cypher for relationship based on the relationship name and query type.         
-        """
-        if relationship_name and query_type:
-            cypher_file_path = os.path.join(self.cypher_path, "relationship", relationship_name, query_type + ".cql")
-        elif cypher_file_path:
-            cypher_file_path = os.path.join(self.cypher_path, "relationship", cypher_file_path)
-        else:
-            raise ValueError("Either relationship_name and query_type or cypher_file_path must be provided.")
-        
-        if cypher_file_path in self.cache:
-            return self.cache[cypher_file_path]
-        
-        if not os.path.isfile(cypher_file_path):
-            print(f"File not exists, cannot open. Check the path {cypher_file_path}")
-            return None
-        with open(cypher_file_path) as f:
-            cypher = f.read()
-        f.close()
-        self.cache[cypher_file_path] = cypher
-
-        return cypher
-    
-
     def query_node(self, node_type, query_type, params, cypher_file_path = None):
         cypher = self.load_cypher(node_type, query_type, cypher_file_path)
 
@@ -140,4 +181,76 @@ class DB:
         cypher = self.load_cypher(node_type, query_type, cypher_file_path)
         if not cypher:
             raise ValueError(f"No cypher for {node_type}.{query_type}")
-        return self.query_to_dataframe(cypher, params)
\ No newline at end of file
+        return self.query_to_dataframe(cypher, params)
+
+
+class AsyncDB(CypherFiles):
+    """
+    Async counterpart of DB for the FastAPI routers, built on the Neo4j async driver.
+    Cypher file loading is shared with DB through CypherFiles; the query methods are coroutines.
+    """
+    def __init__(self):
+        super().__init__()
+        self.driver: AsyncGraphDatabase.driver = None
+
+    async def connect(self, file_name = "db.env", max_connection_pool_size = NEO4J_MAX_POOL_SIZE
+                      , connection_acquisition_timeout = NEO4J_ACQUISITION_TIMEOUT, keep_alive = NEO4J_KEEP_ALIVE
+                      , max_connection_lifetime = NEO4J_MAX_CONNECTION_LIFETIME):
+        load_status = dotenv.load_dotenv(file_name)
+        if load_status is False:
+            raise RuntimeError('Environment variables not loaded.')
+
+        URI = os.getenv("NEO4J_URI")
+        AUTH = (os.getenv("NEO4J_USERNAME"), os.getenv("NEO4J_PASSWORD"))
+
+        self.driver = AsyncGraphDatabase.driver(
+            URI, auth=AUTH
+            , max_connection_pool_size=max_connection_pool_size
+            , connection_acquisition_timeout=connection_acquisition_timeout
+            , keep_alive=keep_alive
+            , max_connection_lifetime=max_connection_lifetime
+        )
+        await self.driver.verify_connectivity()
+        print("Async connection established.")
+
+    async def close(self):
+        if self.driver is not None:
+            await self.driver.close()
+            self.driver = None
+
+    async def execute_query(self, cypher, params = None):
+        records, summary, keys = None, None, None
+        try:
+            records, summary, keys = await self.driver.execute_query(
+                cypher, params or {}
+            )
+        except Exception as e:
+            print("Failed to execute query: ", e)
+
+        return records, summary, keys
+
+    async def query(self, cypher, params = None):
+        return await self.execute_query(cypher, params)
+
+    async def query_to_dataframe(self, cypher: str, params: dict = None) -> pd.DataFrame:
+        """
+        Execute a Cypher query and return results as a DataFrame.
+        """
+        records, _, keys = await self.execute_query(cypher, params or {})
+        rows = [{k: rec[k] for k in keys} for rec in records or []]
+        return pd.DataFrame(rows)
+
+    async def query_node_df(
+        self,
+        node_type: str,
+        query_type: str,
+        params: dict = None,
+        cypher_file_path: str = None
+    ) -> pd.DataFrame:
+        """
+        Load a node-based Cypher from file, execute it, and return a DataFrame.
+        """
+        cypher = self.load_cypher(node_type, query_type, cypher_file_path)
+        if not cypher:
+            raise ValueError(f"No cypher for {node_type}.{query_type}")
+        return await self.query_to_dataframe(cypher, params)
@@ -1,4 +1,5 @@
 import os
+import time
 import pandas as pd
 from dataloading.api import DB
 from datetime import datetime
@@ -14,18 +15,127 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+# The IS NOT NULL predicates let the planner read the ProcessRun.id / SurveyPeriod.created_at
+# range indexes in order instead of sorting a label scan (see dataloading/schema.py)
+LAST_PROCESS_RUN_CYPHER = """
+        MATCH (r:ProcessRun)
+        WHERE r.id IS NOT NULL
+        RETURN r
+        ORDER BY r.id DESC
+        LIMIT 1
+        """
+
+LAST_COMPLETED_PROCESS_RUN_CYPHER = """
+            MATCH (r:ProcessRun {status: "completed"})
+            WHERE r.id IS NOT NULL
+            RETURN r
+            ORDER BY r.id DESC
+            LIMIT 1
+            """
+
+LAST_SURVEY_PERIOD_CYPHER = """
+        MATCH (s:SurveyPeriod)
+        WHERE s.created_at IS NOT NULL
+        RETURN s
+        ORDER BY s.created_at DESC
+        LIMIT 1
+        """
+
+# Participant-to-participant relationship types stored with a run_id and their relation label
+AGENT_RELATION_LABELS = {
+    "has_friend": "friends",
+    "get_advice": "advice",
+    "spend_more_time": "moretime",
+    "has_influence": "influential",
+    "disrespect": "disrespect",
+    "has_feedback": "unknown",
+}
+
+# One typed branch per relation so each is a run_id index seek rather than a scan of every relationship
+AGENT_RELATIONSHIP_CYPHER = """
+        CALL {
+""" + "\n            UNION ALL\n".join(
+    f"""            MATCH (p1:Participant)-[r:{rel_type} {{run_id: $runid}}]->(p2:Participant)
+            RETURN p1, p2, "{relation}" AS relation"""
+    for rel_type, relation in AGENT_RELATION_LABELS.items()
+) + """
+        }
+        WITH p1, p2, relation
+        ORDER BY relation
+        RETURN p1.participant_id AS Source, 
+                p2.participant_id AS Target,
+                relation AS Relation
+        """
+
 class DataLoader:
     def __init__(self, db, folder = "data", loaded_sheet = ["participants", "responses"]
-                 , loaded_relationship = ["net_0_friends"]):
+                 , loaded_relationship = ["net_0_friends"], batch_size = 1000):
         self.folder = os.path.join(os.path.dirname(__file__), folder)
         self.db: DB = db
         self.loaded_sheet = loaded_sheet
         self.loaded_relationship = loaded_relationship
-    
-    def load_node_df(self, df, cypher):
+        # Rows sent per UNWIND round trip, None/0 keeps one round trip per row
+        self.batch_size = batch_size
+        # Callbacks notified after agent/process-run writes (e.g. cache invalidation)
+        self.write_listeners = []
+
+    def add_write_listener(self, listener):
+        """
+        Register listener(event) to be called after create_agent_data / update_last_process_run.
+        """
+        if listener not in self.write_listeners:
+            self.write_listeners.append(listener)
+
+    def notify_write(self, event):
+        for listener in self.write_listeners:
+            try:
+                listener(event)
+            except Exception as e:
+                logger.warning(f"Write listener failed for {event}: {e}")
+
+    def execute_batched(self, rows, cypher, label = None, batch_size = None):
+        """
+        Run a single-row cypher for many rows with UNWIND batches of batch_size rows.
+        A failed batch (one transaction, so nothing of it was written) is retried row by row,
+        so only the rows that fail on their own are dropped; those are logged as errors.
+        Returns the values of the first returned column and logs rows/s for the label.
+        """
+        batch_size = batch_size or self.batch_size
+        unwind_cypher = self.db.to_unwind_cypher(cypher)
+
+        processed = []
+        failed_rows = 0
+        start = time.perf_counter()
+        for offset in range(0, len(rows), batch_size):
+            batch = rows[offset:offset + batch_size]
+            records, summary, keys = self.db.execute_query(unwind_cypher, {"rows": batch})
+            if records is None:
+                logger.error(f"{label}: batch starting at row {offset} failed, retrying its {len(batch)} rows one by one")
+                for row_offset, row in enumerate(batch, start=offset):
+                    records, summary, keys = self.db.execute_query(cypher, row)
+                    if records is None:
+                        failed_rows += 1
+                        logger.error(f"{label}: row {row_offset} failed and was not loaded: {row}")
+                    elif keys:
+                        processed.extend(rec[keys[0]] for rec in records)
+                continue
+            if keys:
+                processed.extend(rec[keys[0]] for rec in records)
+
+        elapsed = time.perf_counter() - start
+        rate = len(rows) / elapsed if elapsed > 0 else float("inf")
+        logger.info(f"{label}: loaded {len(rows) - failed_rows} rows in {elapsed:.2f}s ({rate:.0f} rows/s, batch size {batch_size})")
+        if failed_rows:
+            logger.error(f"{label}: {failed_rows} of {len(rows)} rows failed to load")
+
+        return processed
+
+    def load_node_df(self, df, cypher, label = None):
         """
         Create node/ relationship in neo4j using the cypher query with data from the dataframe
         """
+        if self.batch_size:
+            return self.execute_batched(df.to_dict("records"), cypher, label=label)
 
         processed = []
         for row in df.to_dict("records"):
@@ -36,14 +146,20 @@ class DataLoader:
         
         return processed
 
-    def load_relationsihp_df(self, df, cypher, load_id):
+    def load_relationsihp_df(self, df, cypher, load_id, label = None):
         """
         Create relationship in neo4j using the cypher query with data from the dataframe
         The relationship is related to a particular load_id
         """
-        processed = []
-        for row in df.to_dict("records"):
+        rows = df.to_dict("records")
+        for row in rows:
             row["run_id"] = load_id
+
+        if self.batch_size:
+            self.execute_batched(rows, cypher, label=label)
+            return
+
+        for row in rows:
             records, summary, keys = self.db.execute_query(cypher, row)
         
     def load_excel_file(self, file_path, run_id):
@@ -67,7 +183,7 @@ class DataLoader:
 
                 cypher = self.db.load_cypher(node_type=target_name, query_type="create")
 
-                record= self.load_node_df(df, cypher)
+                record= self.load_node_df(df, cypher, label=sheet_name)
                 result[sheet_name] = df
 
         return result
@@ -97,12 +213,16 @@ class DataLoader:
                     logger.info(f"Cypher not found for {target_sheet_name}")
                     continue
                 
-                self.load_relationsihp_df(df, cypher, run_id)
+                self.load_relationsihp_df(df, cypher, run_id, label=sheet_name)
                 relationships[target_sheet_name] = df
         return relationships
 
     def load_node(self, df:pd.DataFrame, node_type):
 
+        if self.batch_size:
+            cypher = self.db.load_cypher(node_type, "create")
+            return self.execute_batched(df.to_dict(orient = "records"), cypher, label=node_type)
+
         insertedID = []
         for row in df.to_dict(orient = "records"):
             records, summary, keys =  self.db.query_node(node_type, "create", params=row)
@@ -112,20 +232,10 @@ class DataLoader:
         return insertedID
 
     def get_last_process_run(self, success = False):
-        cypher = """
-        MATCH (r:ProcessRun)
-        RETURN r
-        ORDER BY r.id DESC
-        LIMIT 1
-        """
+        cypher = LAST_PROCESS_RUN_CYPHER
 
         if success:
-            cypher = """
-            MATCH (r:ProcessRun {status: "completed"})
-            RETURN r
-            ORDER BY r.id DESC
-            LIMIT 1
-            """
+            cypher = LAST_COMPLETED_PROCESS_RUN_CYPHER
 
         records, summary, key = self.db.execute_query(cypher, {})
         return records[0][key[0]]['id'] if records else None
@@ -140,12 +250,7 @@ class DataLoader:
         return records[0][key[0]]['id'] if records else None
     
     def get_last_survey_period(self):
-        cypher = """
-        MATCH (s:SurveyPeriod)
-        RETURN s
-        ORDER BY s.created_at DESC
-        LIMIT 1
-        """
+        cypher = LAST_SURVEY_PERIOD_CYPHER
         records, summary, keys = self.db.execute_query(cypher, {})
         return records[0][keys[0]]['id'] if records else None
 
@@ -186,6 +291,12 @@ class DataLoader:
 
         """
 
+        if self.batch_size:
+            rows = [{"participant_id": row["participant_id"], "survey_period_id": survey_period}
+                    for row in df.to_dict(orient='records')]
+            self.execute_batched(rows, cypher, label="participated_in")
+            return
+
         for row in df.to_dict(orient='records'):
             params = {
                 "participant_id": row["participant_id"],
@@ -272,7 +383,7 @@ class DataLoader:
             logger.info("Metrics cypher not found")
             return
 
-        metrics = self.load_node_df(participant_df, metric_cypher)
+        metrics = self.load_node_df(participant_df, metric_cypher, label="metrics")
 
         logger.info(f"Loaded {len(participant_df)} metrics from {file_path}")
         
@@ -647,22 +758,7 @@ class DataLoader:
         return self.db.query_to_dataframe(cypher, {"process_run_id": runid})
 
     def load_agent_relationship_df(self, runid):
-       cypher = """ MATCH (p1:Participant)-[r]->(p2:Participant)
-        WHERE r.run_id = $runid
-        WITH p1, p2, 
-        CASE  
-            WHEN type(r) = "has_friend" THEN "friends"
-            WHEN type(r) = "get_advice" THEN "advice"
-            WHEN type(r) = "spend_more_time" THEN "moretime"
-            WHEN type(r) = "has_influence" THEN "influential"
-            WHEN type(r) = "disrespect" THEN "disrespect"
-            ELSE "unknown"
-        END AS relation
-        ORDER BY relation
-        RETURN p1.participant_id AS Source, 
-                p2.participant_id AS Target,
-                relation AS Relation
-       """
+       cypher = AGENT_RELATIONSHIP_CYPHER
 
        return self.db.query_to_dataframe(cypher, {"runid": runid})
 
@@ -674,24 +770,28 @@ class DataLoader:
         if not self._validate_required_keys(df_dict, ["df", "predicted_links", "Y_pred_df"]):
             return None
 
-        # Get the next process run ID
-        last_run_id = self.get_last_process_run() + 1
-        self.create_process_run(last_run_id, run_type="agent_data", name = "Agent Data Loader " + str(last_run_id), description = "Agent data loading ")
-        
-        # Process metrics
-        if not self._process_metrics(df_dict["df"], last_run_id):
-            return None
+        try:
+            # Get the next process run ID
+            last_run_id = self.get_last_process_run() + 1
+            self.create_process_run(last_run_id, run_type="agent_data", name = "Agent Data Loader " + str(last_run_id), description = "Agent data loading ")
+            
+            # Process metrics
+            if not self._process_metrics(df_dict["df"], last_run_id):
+                return None
 
-        # Process survey data
-        if not self._process_survey_data(df_dict["Y_pred_df"], last_run_id):
-            return None
+            # Process survey data
+            if not self._process_survey_data(df_dict["Y_pred_df"], last_run_id):
+                return None
 
-        # Process relationships
-        if not self._process_relationships(df_dict["predicted_links"], last_run_id):
-            return None
+            # Process relationships
+            if not self._process_relationships(df_dict["predicted_links"], last_run_id):
+                return None
 
-        logger.info(f"Agent data creation completed successfully for run ID {last_run_id}")
-        return last_run_id
+            logger.info(f"Agent data creation completed successfully for run ID {last_run_id}")
+            return last_run_id
+        finally:
+            # Partial writes change the counts too
+            self.notify_write("create_agent_data")
 
     def _validate_required_keys(self, df_dict: dict[str, pd.DataFrame], required_keys: list[str]) -> bool:
 
@@ -746,6 +846,23 @@ class DataLoader:
 
         return agent_data
     
+    def get_last_allocation(self) -> pd.Series:
+        """
+        Assigned class per participant from the last saved (completed) process run.
+        Used to warm-start the allocation solver.
+        """
+        last_run_id = self.get_last_process_run(success=True)
+        if not last_run_id:
+            logger.info("No saved allocation found")
+            return None
+
+        df = self.load_agent_survey_df(last_run_id)
+        if df.empty or "Assigned_Class" not in df.columns:
+            logger.info(f"No allocation stored for run ID {last_run_id}")
+            return None
+
+        return df.set_index("Participant_ID")["Assigned_Class"]
+
     def agent_sample_load(self):
 
         last_pr = self.get_last_process_run()
@@ -789,4 +906,22 @@ class DataLoader:
         RETURN r.id
         """
         records, summary, keys = self.db.execute_query(cypher, {"process_run_id": process_run_id, "status": status})
+        self.notify_write("update_last_process_run")
+        return records[0][keys[0]] if records else None
+
+    def update_process_run_stats(self, process_run_id, stats: dict):
+        """
+        Store run statistics (e.g. link model epochs, validation loss, training time) as ProcessRun properties.
+        """
+        if not process_run_id or not stats:
+            return None
+
+        cypher = """
+        MATCH (r:ProcessRun {id: $process_run_id})
+        SET r += $stats, r.updated_at = $updated_at
+        RETURN r.id
+        """
+        records, summary, keys = self.db.execute_query(cypher, {"process_run_id": process_run_id,
+                                                                "stats": stats,
+                                                                "updated_at": datetime.now().isoformat()})
         return records[0][keys[0]] if records else None
\ No newline at end of file
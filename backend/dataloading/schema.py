@@ -0,0 +1,140 @@
+import os
+import logging
+from dataloading.api import DB
+from config import NEO4J_SCHEMA_AWAIT_SECONDS
+from dataloading.dataloader import (
+    LAST_PROCESS_RUN_CYPHER, LAST_COMPLETED_PROCESS_RUN_CYPHER, LAST_SURVEY_PERIOD_CYPHER
+    , AGENT_RELATIONSHIP_CYPHER
+)
+
+logger = logging.getLogger(__name__)
+
+CONSTRAINTS_FILE = os.path.join(os.path.dirname(__file__), "cypher", "constraints.cql")
+
+# (label, property) range indexes for the process-run / survey-period lookups
+NODE_INDEXES = [
+    ("ProcessRun", "id"),
+    ("SurveyPeriod", "id"),
+    ("SurveyPeriod", "created_at"),
+]
+
+# Every relationship type written with a run_id property
+RUN_ID_RELATIONSHIP_TYPES = [
+    "has_friend",
+    "has_influence",
+    "has_feedback",
+    "spend_more_time",
+    "get_advice",
+    "disrespect",
+    "join_affiliation",
+]
+
+# Queries checked with EXPLAIN after the schema is applied
+INDEX_PROBES = {
+    "get_last_process_run": (LAST_PROCESS_RUN_CYPHER, {}),
+    "get_last_process_run(success)": (LAST_COMPLETED_PROCESS_RUN_CYPHER, {}),
+    "get_process_run": ("MATCH (r:ProcessRun {id: $process_run_id}) RETURN r LIMIT 1", {"process_run_id": 0}),
+    "get_last_survey_period": (LAST_SURVEY_PERIOD_CYPHER, {}),
+    "load_agent_relationship_df": (AGENT_RELATIONSHIP_CYPHER, {"runid": 0}),
+}
+
+
+def load_constraint_statements(file_path = CONSTRAINTS_FILE):
+    with open(file_path) as f:
+        text = f.read()
+    return [stmt.strip() for stmt in text.split(";") if stmt.strip()]
+
+
+def existing_index_schemas(db: DB):
+    """
+    Set of (labelOrType, (properties...)) already covered by an index, including constraint-backed ones.
+    """
+    records, _, _ = db.execute_query(
+        "SHOW INDEXES YIELD labelsOrTypes, properties WHERE labelsOrTypes IS NOT NULL "
+        "RETURN labelsOrTypes, properties", {}
+    )
+    schemas = set()
+    for rec in records or []:
+        for label in rec["labelsOrTypes"]:
+            schemas.add((label, tuple(rec["properties"] or [])))
+    return schemas
+
+
+def index_statements(existing = None):
+    """
+    CREATE INDEX statements for the lookup indexes not yet covered by `existing`.
+    """
+    existing = existing or set()
+    statements = []
+    for label, prop in NODE_INDEXES:
+        if (label, (prop,)) in existing:
+            continue
+        statements.append(
+            f"CREATE RANGE INDEX `{prop}_{label}_idx` IF NOT EXISTS "
+            f"FOR (n:`{label}`) ON (n.`{prop}`)"
+        )
+    for rel_type in RUN_ID_RELATIONSHIP_TYPES:
+        if (rel_type, ("run_id",)) in existing:
+            continue
+        statements.append(
+            f"CREATE RANGE INDEX `run_id_{rel_type}_idx` IF NOT EXISTS "
+            f"FOR ()-[r:`{rel_type}`]-() ON (r.`run_id`)"
+        )
+    return statements
+
+
+def _plan_operators(plan):
+    if not plan:
+        return []
+    operators = [plan.get("operatorType", "")]
+    for child in plan.get("children", []):
+        operators.extend(_plan_operators(child))
+    return operators
+
+
+def explain_index_usage(db: DB, probes = None):
+    """
+    EXPLAIN each probe query and return {name: [index operators in the plan]}.
+    An empty list means the query still scans.
+    """
+    probes = probes or INDEX_PROBES
+    report = {}
+    for name, (cypher, params) in probes.items():
+        _, summary, _ = db.execute_query("EXPLAIN " + cypher, params)
+        plan = getattr(summary, "plan", None) if summary else None
+        report[name] = [op for op in _plan_operators(plan) if "Index" in op]
+    return report
+
+
+def ensure_schema(db: DB, report = True, await_seconds = NEO4J_SCHEMA_AWAIT_SECONDS):
+    """
+    Idempotently apply constraints.cql and the lookup indexes, optionally wait up to
+    await_seconds for them to come online, and (optionally) log which queries hit an index.
+    """
+    # DB.execute_query swallows errors and returns no summary: e.g. a UNIQUE constraint cannot be
+    # created while duplicate values exist, and the database then runs without it
+    failed = []
+    for stmt in load_constraint_statements() + index_statements(existing_index_schemas(db)):
+        _, summary, _ = db.execute_query(stmt, {})
+        if summary is None:
+            failed.append(stmt)
+            logger.error(f"Schema statement failed: {' '.join(stmt.split())}")
+
+    if failed:
+        logger.error(f"Schema incomplete: {len(failed)} constraint/index statement(s) failed")
+    else:
+        logger.info("Schema ensured")
+
+    if await_seconds:
+        db.execute_query("CALL db.awaitIndexes($seconds)", {"seconds": await_seconds})
+
+    if not report:
+        return None
+
+    usage = explain_index_usage(db)
+    for name, operators in usage.items():
+        if operators:
+            logger.info(f"{name}: index hit ({', '.join(operators)})")
+        else:
+            logger.info(f"{name}: no index used")
+    return usage
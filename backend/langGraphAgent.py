@@ -16,13 +16,15 @@ from services.db import get_db
 from services.loader import get_loader
 from dataloading.dataloader import DataLoader
 
-from algorithm.feature_engineer import (build_updated_net_dict,
-                              compute_sna_features_from_graphs,
-                              compute_predicted_wellbeing_scores)
-
-from algorithm.cp_sat import apply_thresholds_from_classes
+# algorithm.* (torch, torch_geometric, ortools) is imported inside the functions that
+# need it, so importing the chat router does not load the ML stack
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from algorithm.feature_engineer import IncrementalSNAFeatures
+    from algorithm.multilink_prediction import LinkThresholdCache
 
 import joblib
+import threading
 
 class GraphAgentState(BaseModel):
     messages: List[BaseMessage]
@@ -64,12 +66,11 @@ def reload_data_and_graph(columns_to_drop:List[str] = None, dl:DataLoader = None
     }, inplace=True)
 
 
-    # Assign new nodes
+    # Assign new nodes: edges added in row order (rows with a missing Relation included), so edge
+    # keys and insertion order follow the edge table
     G_new = nx.MultiDiGraph()
-
-    for _, row in edges.iterrows():
-        u, v, rel = row["Source"], row["Target"], row["Relation"]
-        G_new.add_edge(u, v, relation=rel)
+    G_new.add_edges_from(zip(edges["Source"].tolist(), edges["Target"].tolist(),
+                             ({"relation": rel} for rel in edges["Relation"].tolist())))
 
     # Assign node attributes from df_nodes
     for node_id, attrs in df_nodes.to_dict(orient="index").items():
@@ -164,6 +165,68 @@ def run_agent(query):
     return ""
 
 
+# Trained bundles stay resident between reallocations, keyed by file version
+_bundle_cache = {}
+_bundle_lock = threading.Lock()
+
+def load_model_bundle(path: str = "agent_models_bundle.pkl") -> dict:
+    """
+    Load the model bundle once per version of the file on disk.
+    Returns the cache entry holding the bundle and its link threshold caches.
+    """
+    stat = os.stat(path)
+    version = (stat.st_mtime_ns, stat.st_size)
+
+    with _bundle_lock:
+        entry = _bundle_cache.get(path)
+        if entry is None or entry["version"] != version:
+            entry = {"version": version, "bundle": joblib.load(path), "link_caches": {}, "sna_engines": {}}
+            _bundle_cache[path] = entry
+    return entry
+
+def get_link_threshold_cache(bundle_entry: dict, same_class_threshold: float, diff_class_threshold: float) -> "LinkThresholdCache":
+    """
+    The pairwise link probabilities are computed once per bundle; each threshold
+    pair keeps its own link mask so a move only re-thresholds the moved student.
+    """
+    from algorithm.multilink_prediction import LinkThresholdCache
+
+    key = (same_class_threshold, diff_class_threshold)
+
+    with _bundle_lock:
+        link_cache = bundle_entry["link_caches"].get(key)
+        if link_cache is None:
+            bundle = bundle_entry["bundle"]
+            relation_list = list(bundle["relation_to_label"].keys())
+            probs = bundle_entry.get("link_probabilities")
+            if probs is None:
+                link_cache = LinkThresholdCache.from_model(
+                    bundle["embeddings"], bundle["multilabel_link_model"], relation_list,
+                    same_class_threshold, diff_class_threshold
+                )
+                bundle_entry["link_probabilities"] = link_cache.probs
+            else:
+                link_cache = LinkThresholdCache(probs, relation_list, same_class_threshold, diff_class_threshold)
+            bundle_entry["link_caches"][key] = link_cache
+    return link_cache
+
+def get_sna_feature_engine(bundle_entry: dict, same_class_threshold: float, diff_class_threshold: float) -> "IncrementalSNAFeatures":
+    """
+    One incremental SNA engine per link threshold cache: consecutive reallocations
+    only recompute the classes whose intra-class links changed.
+    """
+    from algorithm.feature_engineer import IncrementalSNAFeatures
+
+    key = (same_class_threshold, diff_class_threshold)
+
+    with _bundle_lock:
+        engine = bundle_entry["sna_engines"].get(key)
+        if engine is None:
+            engine = IncrementalSNAFeatures(bundle_entry["bundle"]["relationship_weights"])
+            bundle_entry["sna_engines"][key] = engine
+    return engine
+
+
 # Other part code
 def load_allocate_original_data(dl: DataLoader):
     print("Running load_allocate_original_data")
@@ -175,7 +238,8 @@ def load_allocate_original_data(dl: DataLoader):
 
     # Load all models and configs from bundle
     model = joblib.load("survey_predictor.pkl")
-    bundle = joblib.load("agent_models_bundle.pkl")
+    bundle_entry = load_model_bundle("agent_models_bundle.pkl")
+    bundle = bundle_entry["bundle"]
 
     survey_predictor = bundle["survey_predictor"]
     multilabel_link_model = bundle["multilabel_link_model"]
@@ -199,7 +263,9 @@ def load_allocate_original_data(dl: DataLoader):
         "X_train_columns": X_train_columns,
         "Y_train_columns": Y_train_columns,
         "alloc_df": alloc_df,
-        'survey_predictor': survey_predictor
+        'survey_predictor': survey_predictor,
+        "link_cache": get_link_threshold_cache(bundle_entry, 0.53, 0.69),
+        "sna_features": get_sna_feature_engine(bundle_entry, 0.53, 0.69)
     }
 
 
@@ -259,6 +325,14 @@ def save_reallocation(run_id:int = None):
 
 def reallocate_student_to_class(student_id: int, new_class: int, df_data: dict = None):
     print("Running reallocate_student_to_class")
+    from algorithm.feature_engineer import (build_updated_net_dict,
+                                  compute_sna_features_from_graphs,
+                                  compute_predicted_wellbeing_scores)
+    from algorithm.cp_sat import apply_thresholds_from_classes
+    from algorithm.survey_predictor import predict_survey_outcomes
+    from algorithm.utils import set_seed
+    set_seed(42)
+
     # Step 1: Gather data from df_data_dict
     model = df_data["model"]
     multilabel_link_model = df_data["multilabel_link_model"]
@@ -274,24 +348,33 @@ def reallocate_student_to_class(student_id: int, new_class: int, df_data: dict =
     alloc_df.loc[student_id, "Assigned_Class"] = new_class
 
     # === Step 3: Reapply threshold on new allocation
-    relation_list = list(relation_to_label.keys())
-    predicted_links = apply_thresholds_from_classes(
-        embeddings=embeddings,
-        model=multilabel_link_model,
-        relation_list=relation_list,
-        alloc_df=alloc_df,
-        same_class_threshold=0.53,
-        diff_class_threshold=0.69
-    )
+    # Probabilities are cached per bundle, only the moved student's rows/columns are re-thresholded
+    link_cache = df_data.get("link_cache")
+    if link_cache is not None:
+        predicted_links = link_cache.links_for_allocation(alloc_df["Assigned_Class"].to_numpy())
+    else:
+        relation_list = list(relation_to_label.keys())
+        predicted_links = apply_thresholds_from_classes(
+            embeddings=embeddings,
+            model=multilabel_link_model,
+            relation_list=relation_list,
+            alloc_df=alloc_df,
+            same_class_threshold=0.53,
+            diff_class_threshold=0.69
+        )
 
     # === Step 4: Rebuild graph + compute updated features
-    net_dict_updated = build_updated_net_dict(alloc_df, predicted_links)
-    X_post = compute_sna_features_from_graphs(net_dict_updated, relationship_weights).fillna(0)
+    sna_engine = df_data.get("sna_features")
+    if sna_engine is not None:
+        X_post = sna_engine.update(alloc_df, predicted_links).fillna(0)
+    else:
+        net_dict_updated = build_updated_net_dict(alloc_df, predicted_links)
+        X_post = compute_sna_features_from_graphs(net_dict_updated, relationship_weights).fillna(0)
     X_post = X_post.reindex(columns=X_train_columns, fill_value=0)
     X_post.index = alloc_df.index
 
     # === Step 5: Predict survey outcomes and wellbeing
-    Y_pred = model.predict(X_post)
+    Y_pred = predict_survey_outcomes(model, X_post)
     Y_pred_df_local = pd.DataFrame(Y_pred, index=X_post.index, columns=Y_train_columns).fillna(0)
     wellbeing_df = compute_predicted_wellbeing_scores(Y_pred_df_local)
 
@@ -1,7 +1,9 @@
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
 from services.loader import get_loader
-from services.db import get_db
+from services.db import get_db, close_db, close_async_db
+from services.metrics_cache import close_metrics_cache
+from dataloading.schema import ensure_schema
 from fastapi.middleware.cors import CORSMiddleware
 
 # Import routers
@@ -10,10 +12,16 @@ from routers import metric, run, ws, chat
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     dl = get_loader()
+    # Constraints and lookup indexes before any load/query (idempotent)
+    ensure_schema(dl.db)
     # Load the data when the app starts
     dl.load_test_data("test_data_load.xlsx")
     dl.agent_sample_load()
     yield
+    # Release the pooled Neo4j drivers on shutdown
+    close_db()
+    await close_async_db()
+    await close_metrics_cache()
 
 app = FastAPI(lifespan=lifespan)
 app.include_router(metric.router)
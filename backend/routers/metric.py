@@ -1,16 +1,15 @@
 from fastapi import APIRouter
 from fastapi.responses import HTMLResponse
-from services.db import get_db
-from services.loader import get_loader
+from services.db import get_async_db
+from services.metrics_cache import get_cached_summary
+from services.process_runs import get_latest_process_run_id
 
 router = APIRouter()
 
     # 1. function for route getting latest process id
 @router.get("/latest-process-id")
 async def get_latest_process_id():
-    dl = get_loader()
-
-    process_id = dl.get_last_process_run()
+    process_id = await get_latest_process_run_id()
     if process_id is None:
         return {"latest_process_id": "Not found"}
     return {"latest_process_id": process_id}
@@ -19,9 +18,9 @@ async def get_latest_process_id():
 @router.get("/metrics/participants")
 async def get_participant_count():
     try:
-        db = get_db()
+        db = await get_async_db()
         cypher = "MATCH (p:Participant) RETURN count(p) AS count"
-        df = db.query_to_dataframe(cypher)
+        df = await db.query_to_dataframe(cypher)
         count = int(df.iloc[0]["count"]) if not df.empty else 0
         return {"participant_count": count}
     except Exception as e:
@@ -31,9 +30,9 @@ async def get_participant_count():
 @router.get("/metrics/processes")
 async def get_process_count():
     try:
-        db = get_db()
+        db = await get_async_db()
         cypher = "MATCH (pr:Process) RETURN count(pr) AS count"
-        df = db.query_to_dataframe(cypher)
+        df = await db.query_to_dataframe(cypher)
         count = int(df.iloc[0]["count"]) if not df.empty else 0
         return {"process_count": count}
     except Exception as e:
@@ -43,10 +42,37 @@ async def get_process_count():
 @router.get("/metrics/relationships")
 async def get_relationship_count():
     try:
-        db = get_db()
+        db = await get_async_db()
         cypher = "MATCH ()-[r]->() RETURN count(r) AS count"
-        df = db.query_to_dataframe(cypher)
+        df = await db.query_to_dataframe(cypher)
         count = int(df.iloc[0]["count"]) if not df.empty else 0
         return {"relationship_count": count}
     except Exception as e:
-        return {"status": "error", "message": str(e)}
\ No newline at end of file
+        return {"status": "error", "message": str(e)}
+
+SUMMARY_CYPHER = """
+CALL { MATCH (p:Participant) RETURN count(p) AS participant_count }
+CALL { MATCH (pr:Process) RETURN count(pr) AS process_count }
+CALL { MATCH ()-[r]->() RETURN count(r) AS relationship_count }
+RETURN participant_count, process_count, relationship_count
+"""
+
+async def compute_metrics_summary():
+    db = await get_async_db()
+    df = await db.query_to_dataframe(SUMMARY_CYPHER)
+    if df.empty:
+        return {"participant_count": 0, "process_count": 0, "relationship_count": 0}
+    row = df.iloc[0]
+    return {
+        "participant_count": int(row["participant_count"]),
+        "process_count": int(row["process_count"]),
+        "relationship_count": int(row["relationship_count"]),
+    }
+
+# All dashboard counts in one query, cached until the next agent-data write
+@router.get("/metrics/summary")
+async def get_metrics_summary():
+    try:
+        return await get_cached_summary(compute_metrics_summary)
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
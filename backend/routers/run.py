@@ -1,8 +1,7 @@
 from enum import Enum
-from fastapi import APIRouter, Depends, HTTPException
-from services.loader import get_loader
+from fastapi import APIRouter, HTTPException
 from services.queue import queue
-from algofunction import run_algorithm
+from services.process_runs import get_latest_process_run_id
 from pydantic import BaseModel
 router = APIRouter()
 
@@ -25,8 +24,7 @@ class RunAlgorithmResponse(BaseModel):
 
 @router.post("/run")
 async def run_algo(
-    req: RunAlgorithmRequest,
-    dl = Depends(get_loader)
+    req: RunAlgorithmRequest
 ):
     """
     Run the algorithm with the given option and save data if specified.
@@ -37,7 +35,7 @@ async def run_algo(
 
     """
     try:
-        last = dl.get_last_process_run()
+        last = await get_latest_process_run_id()
         next_id = (last + 1) if last is not None else 0
         job_id = str(next_id)
 
@@ -47,8 +45,9 @@ async def run_algo(
             return {"status": f"Job already submitted", "job_id": job_id}
 
         # enqueue your function, passing option & save_data
+        # enqueued by dotted path so the API never imports the algorithm stack
         queue.enqueue(
-            run_algorithm,
+            "algofunction.run_algorithm",
             req.option.value,
             req.save_data,
             job_id=job_id
@@ -1,16 +1,60 @@
 import os 
+import asyncio
+import threading
 from neo4j import GraphDatabase
 from dotenv import load_dotenv
-from dataloading.api import DB
+from dataloading.api import DB, AsyncDB
 from typing import Optional
+from config import (DB_ENV_PATH, NEO4J_MAX_POOL_SIZE, NEO4J_ACQUISITION_TIMEOUT,
+                    NEO4J_KEEP_ALIVE, NEO4J_MAX_CONNECTION_LIFETIME)
 
 _db: Optional[DB] = None
+_db_lock = threading.Lock()
 
 def get_db() -> DB:
     global _db
-    if _db is None:
-        env = os.getenv("DB_ENV_PATH", "dataloading/db.env")
-        _db = DB()
-        _db.connect(env)
+    # One pooled driver per process, also when the first requests arrive concurrently
+    with _db_lock:
+        if _db is None:
+            db = DB()
+            db.connect(DB_ENV_PATH
+                        , max_connection_pool_size=NEO4J_MAX_POOL_SIZE
+                        , connection_acquisition_timeout=NEO4J_ACQUISITION_TIMEOUT
+                        , keep_alive=NEO4J_KEEP_ALIVE
+                        , max_connection_lifetime=NEO4J_MAX_CONNECTION_LIFETIME)
+            _db = db
     return _db
 
+def close_db() -> None:
+    global _db
+    with _db_lock:
+        if _db is not None:
+            _db.close()
+            _db = None
+
+_async_db: Optional[AsyncDB] = None
+_async_db_lock: Optional[asyncio.Lock] = None
+
+async def get_async_db() -> AsyncDB:
+    global _async_db, _async_db_lock
+    if _async_db is not None:
+        return _async_db
+
+    if _async_db_lock is None:
+        _async_db_lock = asyncio.Lock()
+    async with _async_db_lock:
+        if _async_db is None:
+            db = AsyncDB()
+            await db.connect(DB_ENV_PATH
+                             , max_connection_pool_size=NEO4J_MAX_POOL_SIZE
+                             , connection_acquisition_timeout=NEO4J_ACQUISITION_TIMEOUT
+                             , keep_alive=NEO4J_KEEP_ALIVE
+                             , max_connection_lifetime=NEO4J_MAX_CONNECTION_LIFETIME)
+            _async_db = db
+    return _async_db
+
+async def close_async_db() -> None:
+    global _async_db
+    if _async_db is not None:
+        await _async_db.close()
+        _async_db = None
@@ -1,5 +1,6 @@
 from fastapi import Depends
 from .db import get_db
+from .metrics_cache import invalidate_metrics_summary
 from dataloading.dataloader import DataLoader
 from typing import Optional
 
@@ -13,4 +14,5 @@ def get_loader() -> DataLoader:
         loaded_sheet = ["participants", "affiliations", "survey_data"]
         _loader = DataLoader(db, folder = 'data',loaded_sheet = loaded_sheet
                              , loaded_relationship= loaded_rela)
+        _loader.add_write_listener(invalidate_metrics_summary)
     return _loader
\ No newline at end of file
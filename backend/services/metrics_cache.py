@@ -0,0 +1,76 @@
+import json
+import asyncio
+from typing import Awaitable, Callable, Dict, Optional
+from redis import asyncio as aioredis
+from config import REDIS_HOST, REDIS_PORT, METRICS_CACHE_TTL
+from services.queue import redis_conn
+
+# The cached value lives in Redis so the worker (which does the writes) can invalidate it.
+# Bumping the generation makes every older entry unreachable, including one that a
+# request computing concurrently with the write stores afterwards.
+SUMMARY_KEY = "metrics:summary"
+GENERATION_KEY = "metrics:summary:generation"
+
+_async_redis: Optional[aioredis.Redis] = None
+_inflight: Dict[str, asyncio.Task] = {}
+
+def _get_async_redis() -> aioredis.Redis:
+    global _async_redis
+    if _async_redis is None:
+        _async_redis = aioredis.Redis(host=REDIS_HOST, port=REDIS_PORT, decode_responses=True)
+    return _async_redis
+
+async def close_metrics_cache() -> None:
+    global _async_redis
+    if _async_redis is not None:
+        await _async_redis.aclose()
+        _async_redis = None
+
+def invalidate_metrics_summary(event = None) -> None:
+    """
+    DataLoader write listener: drop the cached summary.
+    """
+    try:
+        redis_conn.incr(GENERATION_KEY)
+    except Exception as e:
+        print("Failed to invalidate metrics summary: ", e)
+
+async def _cache_key() -> Optional[str]:
+    try:
+        generation = await _get_async_redis().get(GENERATION_KEY)
+    except Exception as e:
+        print("Metrics cache unavailable: ", e)
+        return None
+    return f"{SUMMARY_KEY}:{generation or 0}"
+
+async def _compute_and_store(key: Optional[str], compute: Callable[[], Awaitable[dict]]) -> dict:
+    value = await compute()
+    if key is not None:
+        try:
+            await _get_async_redis().set(key, json.dumps(value), ex=METRICS_CACHE_TTL)
+        except Exception as e:
+            print("Failed to store metrics summary: ", e)
+    return value
+
+async def get_cached_summary(compute: Callable[[], Awaitable[dict]]) -> dict:
+    """
+    Return the cached summary, or run compute() once for all concurrent callers and cache it.
+    """
+    key = await _cache_key()
+    if key is not None:
+        try:
+            cached = await _get_async_redis().get(key)
+        except Exception as e:
+            print("Metrics cache unavailable: ", e)
+            cached = None
+        if cached is not None:
+            return json.loads(cached)
+
+    flight_key = key or SUMMARY_KEY
+    task = _inflight.get(flight_key)
+    if task is None:
+        task = asyncio.ensure_future(_compute_and_store(key, compute))
+        _inflight[flight_key] = task
+        task.add_done_callback(lambda _: _inflight.pop(flight_key, None))
+    # shield so a cancelled client does not cancel the computation the others wait on
+    return await asyncio.shield(task)
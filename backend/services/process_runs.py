@@ -0,0 +1,7 @@
+from services.db import get_async_db
+from dataloading.dataloader import LAST_PROCESS_RUN_CYPHER
+
+async def get_latest_process_run_id():
+    db = await get_async_db()
+    records, _, keys = await db.execute_query(LAST_PROCESS_RUN_CYPHER)
+    return records[0][keys[0]]['id'] if records else None
@@ -1,7 +1,10 @@
 from redis import Redis
-from rq import Worker, Queue
+from rq import Worker, SimpleWorker, Queue
 import pandas as pd
+import gc
 import os
+import signal
+from config import WORKER_MODE, WORKER_MAX_JOBS, WORKER_MAX_RSS_MB, WORKER_ARTIFACT_CACHE_MB
 
 
 listen = ['default']
@@ -12,6 +15,73 @@ redis_conn = Redis(
     
 )
 
+
+class WarmWorker(SimpleWorker):
+    """
+    Runs jobs in the worker process itself (no per-job fork), so imported modules and the
+    in-process artifact cache survive between jobs. After each job the RSS is checked against
+    max_rss_mb: the artifact cache and the centrality memo are dropped first, and if that is not
+    enough the worker stops so the supervisor (docker restart policy) starts a fresh one.
+    """
+    def __init__(self, *args, max_rss_mb = 0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_rss_mb = max_rss_mb
+
+    def execute_job(self, job, queue):
+        from algorithm.artifacts import artifact_cache_stats
+        from algorithm.centrality import centrality_memo_stats
+
+        result = super().execute_job(job, queue)
+        self.log.info("Stage cache: %s", artifact_cache_stats())
+        self.log.info("Centrality memo: %s", centrality_memo_stats())
+        self.enforce_memory_bound()
+        return result
+
+    def enforce_memory_bound(self):
+        if not self.max_rss_mb:
+            return
+        from algorithm.artifacts import process_rss_bytes, clear_artifact_cache
+        from algorithm.centrality import clear_centrality_memo
+
+        limit = self.max_rss_mb * 1024 * 1024
+        if process_rss_bytes() <= limit:
+            return
+
+        clear_artifact_cache()
+        clear_centrality_memo()
+        gc.collect()
+        rss = process_rss_bytes()
+        if rss > limit:
+            self.log.warning("RSS %.0f MB above %d MB, recycling worker", rss / 2**20, self.max_rss_mb)
+            # Same warm shutdown as `docker stop`: rq's SIGTERM handler ends the work loop
+            os.kill(os.getpid(), signal.SIGTERM)
+
+
+def start_warm_worker():
+    from algofunction import preload_algorithm_stack
+    from algorithm.artifacts import configure_artifact_cache
+
+    preload_algorithm_stack()
+    configure_artifact_cache(WORKER_ARTIFACT_CACHE_MB)
+
+    w = WarmWorker(listen, connection=redis_conn, max_rss_mb=WORKER_MAX_RSS_MB)
+    w.work(max_jobs=WORKER_MAX_JOBS or None)
+
+
 if __name__ == "__main__":
-    w = Worker(listen, connection=redis_conn)
-    w.work()
\ No newline at end of file
+    from services.db import get_db, close_db
+    from dataloading.schema import ensure_schema
+
+    ensure_schema(get_db(), report=False)
+    if WORKER_MODE != "warm":
+        # rq.Worker forks a work horse per job and the Neo4j driver is not fork-safe: drop the
+        # parent's pool so each job opens its own connections
+        close_db()
+    try:
+        if WORKER_MODE == "warm":
+            start_warm_worker()
+        else:
+            w = Worker(listen, connection=redis_conn)
+            w.work()
+    finally:
+        close_db()